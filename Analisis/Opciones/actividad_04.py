@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from Analisis.Utils.precalculo import resultado_precalculado
 
 # Función para configurar el estilo de los gráficos
 def configurar_grafico():
@@ -12,8 +13,33 @@ def configurar_grafico():
     plt.rc('xtick', labelsize=12)
     plt.rc('ytick', labelsize=12)
 
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def calcular_actividad(df_chat, id_sesion=None):
+    """
+    Conteos de actividad por hora, día de la semana y fecha
+    (se precalculan en segundo plano al cargar el chat).
+    """
+    timestamps = pd.to_datetime(df_chat['Timestamp'])
+    hora = timestamps.dt.hour
+    dia_semana = timestamps.dt.dayofweek
+
+    # Tabla pivote, con todas las horas (0-23) y días (0-6) presentes
+    df_heatmap = pd.crosstab(hora, dia_semana).reindex(index=range(24), columns=range(7), fill_value=0)
+    df_heatmap.columns = [DIAS_SEMANA[i] for i in df_heatmap.columns]
+
+    return {
+        'heatmap': df_heatmap,
+        'horas': hora.value_counts().reindex(index=range(24), fill_value=0),
+        'dias': dia_semana.value_counts().reindex(index=range(7), fill_value=0),
+        # Mensajes por día
+        'diario': pd.Series(1, index=timestamps).resample('D').size(),
+    }
+
+
 @st.cache_data
-def analizar_actividad(_df_chat):
+def analizar_actividad(_df_chat, huella=None):
     """
     Opción 4: Analiza los patrones de actividad y horarios del chat.
     """
@@ -30,16 +56,13 @@ def analizar_actividad(_df_chat):
         st.warning("El análisis de actividad no puede continuar porque depende de la Timestamp de los mensajes.")
         st.info(f"Columnas encontradas en tu DataFrame: {list(_df_chat.columns)}")
         st.write("---")
-        st.write("**Sugerencia:** Revisa tu función `procesar_chat` (en `Analisis/Utils/aux_opciones.py`) y asegúrate de que esté extrayendo la Timestamp de cada mensaje y guardándola en una columna llamada `Timestamp`.")
+        st.write("**Sugerencia:** Revisa tu función `leer_chat` (en `Analisis/Utils/aux_opciones.py`) y asegúrate de que esté extrayendo la Timestamp de cada mensaje y guardándola en una columna llamada `Timestamp`.")
         return # Detenemos la ejecución de esta función
     # --- FIN DE LA COMPROBACIÓN ---
 
     # Si la comprobación pasa, continuamos como antes.
-    df_actividad = _df_chat.copy()
-    
     try:
-        # Asegurarnos de que 'Timestamp' es un objeto datetime
-        df_actividad['Timestamp'] = pd.to_datetime(df_actividad['Timestamp'])
+        actividad = resultado_precalculado('actividad', _df_chat, calcular_actividad)
     except Exception as e:
         st.error(f"Error al convertir la columna 'Timestamp' a formato de Timestamp y hora: {e}")
         st.write("Asegúrate de que la columna 'Timestamp' contenga Timestamps válidas (ej: '25/12/2023 14:30').")
@@ -47,21 +70,7 @@ def analizar_actividad(_df_chat):
 
     # --- 1. Heatmap de Actividad (Día vs Hora) ---
     st.markdown("#### ¿Cuándo está más activa la conversación?")
-    
-    # Extraer características de tiempo
-    df_actividad['Hora'] = df_actividad['Timestamp'].dt.hour
-    df_actividad['DiaSemanaNum'] = df_actividad['Timestamp'].dt.dayofweek
-    dias_semana_es = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    
-    # Crear la tabla pivote
-    df_heatmap = df_actividad.groupby(['Hora', 'DiaSemanaNum']).size().unstack(fill_value=0)
-    
-    # Asegurar que todas las horas (0-23) y días (0-6) estén presentes
-    df_heatmap = df_heatmap.reindex(index=range(24), fill_value=0)
-    df_heatmap = df_heatmap.reindex(columns=range(7), fill_value=0)
-    
-    # Asignar nombres correctos a las columnas
-    df_heatmap.columns = [dias_semana_es[i] for i in df_heatmap.columns]
+    df_heatmap = actividad['heatmap']
     
     configurar_grafico()
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -85,8 +94,7 @@ def analizar_actividad(_df_chat):
     with col1:
         st.markdown("#### Mensajes por Hora")
         configurar_grafico()
-        # Aseguramos que todas las horas estén presentes para un gráfico completo
-        conteo_horas = df_actividad['Hora'].value_counts().reindex(index=range(24), fill_value=0)
+        conteo_horas = actividad['horas']
         
         fig_hora, ax_hora = plt.subplots()
         sns.barplot(
@@ -102,13 +110,11 @@ def analizar_actividad(_df_chat):
     with col2:
         st.markdown("#### Mensajes por Día de la Semana")
         configurar_grafico()
-        # Ordenar por el número del día de la semana
-        conteo_dias = df_actividad.groupby('DiaSemanaNum').size()
-        conteo_dias = conteo_dias.reindex(index=range(7), fill_value=0)
+        conteo_dias = actividad['dias']
         
         fig_dia, ax_dia = plt.subplots()
         sns.barplot(
-            x=[dias_semana_es[i] for i in conteo_dias.index], 
+            x=[DIAS_SEMANA[i] for i in conteo_dias.index], 
             y=conteo_dias.values,
             ax=ax_dia,
             palette="viridis"
@@ -122,8 +128,7 @@ def analizar_actividad(_df_chat):
     st.markdown("#### Actividad a lo Largo del Tiempo")
     configurar_grafico()
     
-    # Agrupar mensajes por día
-    df_linea = df_actividad.set_index('Timestamp').resample('D').size()
+    df_linea = actividad['diario']
     
     fig_linea, ax_linea = plt.subplots(figsize=(12, 4))
     df_linea.plot(ax=ax_linea, color='royalblue', lw=2)
@@ -10,48 +10,117 @@ from nltk.corpus import stopwords
 from collections import Counter
 import string
 import os
-from Utils.Metodos import cargar_modelo_sentimientos
+from Analisis.Utils.resultados_modelo import obtener_probabilidades, etiquetas
+from Analisis.Utils.lineas_tiempo import esperar_probabilidades
+from Analisis.Utils.precalculo import resultado_precalculado
+from Analisis.Utils.dinamica_conversacion import calcular_dinamica_conversacion, calcular_reciprocidad
+from Analisis.Utils.similitud_autores import (
+    matriz_autor_termino, similitud_intereses, similitud_sentimiento, puntaje_grupal, orden_agrupado
+)
 import numpy as np # Importar numpy para los gradientes
 
-# --- FUNCIÓN AUXILIAR ---
-# (Es mejor tener esta lógica fuera de la función principal)
+# Stopwords en español más palabras comunes de chat que no aportan significado
+PALABRAS_CHAT_VACIAS = ['jaja', 'jajaja', 'jeje', 'jejeje', 'ok', 'vale', 'si', 'no', 'q', 'k', 'https', 'JAJAJA', 'JAJA', 'ja JA JA']
 
-def _limpiar_y_contar_palabras(lista_mensajes, stop_words_es):
+
+def calcular_metricas_amistad(df_chat, sentimientos=None):
     """
-    Limpia una lista de mensajes y devuelve un set con las 25 palabras más comunes.
+    Calcula las métricas de amistad de un chat sin dibujar nada (también la usa la
+    comparación de chats, desde hilos de fondo).
+
+    - `sentimientos`: etiqueta de sentimiento de cada mensaje (None si no se pudo calcular).
+    Devuelve un dict con las cinco métricas, el nivel total, las matrices de similitud
+    entre autores y la dinámica de la conversación.
     """
-    if not lista_mensajes:
-        return set()
-        
-    texto_completo = ' '.join(lista_mensajes).lower()
-    # Eliminar URLs
-    texto_completo = re.sub(r'http\S+', '', texto_completo)
-    # Eliminar menciones y hashtags (común en otros chats)
-    texto_completo = re.sub(r'@\w+|#\w+', '', texto_completo)
-    
-    # Eliminar puntuación
-    translator = str.maketrans('', '', string.punctuation + '¿¡“”')
-    texto_sin_punc = texto_completo.translate(translator)
-    
-    palabras = texto_sin_punc.split()
-    
-    # Filtrar stopwords, números y palabras cortas
-    palabras_filtradas = [
-        p for p in palabras 
-        if p not in stop_words_es and not p.isdigit() and len(p) > 2
-    ]
-    
-    # Devolver las 25 palabras más comunes como un conjunto
-    if not palabras_filtradas:
-        return set()
-        
-    return set([p[0] for p in Counter(palabras_filtradas).most_common(25)])
+    autores_counts = df_chat['Autor'].value_counts()
+
+    stop_words_es = set(stopwords.words('spanish'))
+    stop_words_es.update(PALABRAS_CHAT_VACIAS)
+
+    # --- MÉTRICA 1: Vibra Positiva (Global) ---
+    # Esta métrica mide el sentimiento general de toda la conversación.
+    if sentimientos is not None:
+        vibra_positiva = pd.Series(sentimientos).value_counts(normalize=True).get('POS', 0) * 100
+    else:
+        vibra_positiva = 0.0
+
+    # --- Matrices de Similitud entre Pares de Autores (para métricas 3 y 4) ---
+    # Se comparan TODOS los pares de autores con productos de matrices, en lugar de
+    # intersectar conjuntos de palabras de todo el grupo (que en grupos grandes queda vacío).
+    matriz_terminos, autores, _ = matriz_autor_termino(df_chat, stop_words_es)
+    sim_intereses = similitud_intereses(matriz_terminos)
+    # Los pares se ponderan por participación para que los miembros casi mudos no dominen
+    pesos = autores_counts.reindex(autores).to_numpy(dtype=float)
+
+    # --- MÉTRICA 2: Balance de Participación ---
+    # Compara al que más habla con el que menos habla.
+    counts = autores_counts.tolist()
+    balance_participacion = (min(counts) / max(counts)) * 100 if counts and max(counts) > 0 else 0.0
+
+    # --- MÉTRICA 3: Sincronía Emocional ---
+    # Similitud media (por pares) de las distribuciones de sentimiento de cada autor.
+    if sentimientos is not None:
+        sim_sentimiento = similitud_sentimiento(df_chat['Autor'].to_numpy(), sentimientos, autores)
+        sincronia_emocional = puntaje_grupal(sim_sentimiento, pesos)
+    else:
+        sim_sentimiento = None
+        sincronia_emocional = 0.0
+
+    # --- MÉTRICA 4: Intereses Comunes ---
+    # Similitud coseno media (por pares) del vocabulario de cada autor.
+    intereses_comunes = puntaje_grupal(sim_intereses, pesos)
+
+    # --- MÉTRICA 5: Reciprocidad ---
+    # Usa el orden y la hora de los mensajes: ¿se responden los autores entre sí por igual?
+    dinamica = calcular_dinamica_conversacion(df_chat)
+    reciprocidad = calcular_reciprocidad(dinamica['pares'])
+
+    metricas = {
+        'Intereses Comunes': intereses_comunes,
+        'Sincronía Emocional': sincronia_emocional,
+        'Balance de Participación': balance_participacion,
+        'Vibra Positiva General': vibra_positiva,
+        'Reciprocidad': reciprocidad,
+    }
+    return {
+        'metricas': metricas,
+        # --- CÁLCULO FINAL: Nivel de Amistad (promedio de las cinco métricas) ---
+        'nivel_amistad': sum(metricas.values()) / len(metricas),
+        'autores': autores,
+        'sim_intereses': sim_intereses,
+        'sim_sentimiento': sim_sentimiento,
+        'dinamica': dinamica,
+    }
+
+
+def calcular_amistad(df_chat, id_sesion=None):
+    """
+    Sentimiento de cada mensaje más las métricas de amistad (se precalcula en segundo
+    plano al cargar el chat; `id_sesion` permite usarla fuera del hilo del script).
+    Devuelve None si el chat tiene menos de 2 autores.
+    """
+    if df_chat['Autor'].nunique() < 2:
+        return None
+
+    # El modelo lo atiende el servidor de inferencia. La misma predicción
+    # (una sola llamada) se reutiliza para la vibra global y por autor. Normalmente
+    # ya la ha calculado y guardado el precálculo de las líneas de tiempo.
+    esperar_probabilidades(df_chat, id_sesion=id_sesion)
+    try:
+        resultado_sent = obtener_probabilidades(df_chat, 'sentiment', id_sesion=id_sesion)
+        sentimientos = etiquetas(resultado_sent)
+        resueltos, error_sentimiento = resultado_sent.get('resueltos_por_reglas', 0), None
+    except Exception as e:
+        sentimientos, resueltos, error_sentimiento = None, 0, str(e)
+
+    amistad = calcular_metricas_amistad(df_chat, sentimientos)
+    return {**amistad, 'resueltos_por_reglas': resueltos, 'error_sentimiento': error_sentimiento}
 
 
 # --- FUNCIÓN PRINCIPAL MEJORADA ---
 
 @st.cache_data
-def analizar_nivel_amistad(_df_chat):
+def analizar_nivel_amistad(_df_chat, huella=None):
     """
     Opción 3: Analiza el nivel de amistad y la dinámica de un grupo (2 o más autores).
     """
@@ -61,116 +130,36 @@ def analizar_nivel_amistad(_df_chat):
         st.warning("No se encontraron mensajes válidos para analizar.")
         return
 
-    autores_counts = _df_chat['Autor'].value_counts()
-    num_autores = len(autores_counts)
+    num_autores = _df_chat['Autor'].nunique()
 
     if num_autores < 2:
         st.error(f"Se necesitan al menos 2 autores para un análisis de amistad. (Encontrados: {num_autores})")
         return
         
-    autores_principales = autores_counts.index.tolist()
     st.write(f"Analizando la dinámica de amistad entre {num_autores} participantes.")
 
-    # Cargar modelo (de la caché) y stopwords
     try:
-        sentiment_analyzer = cargar_modelo_sentimientos()
-        stop_words_es = set(stopwords.words('spanish'))
-        # Añadir palabras comunes de chat que no aportan significado
-        stop_words_es.update(['jaja', 'jajaja', 'jeje', 'jejeje', 'ok', 'vale', 'si', 'no', 'q', 'k', 'https', 'JAJAJA', 'JAJA', 'ja JA JA'])
-    except Exception as e:
-        st.error(f"Error al cargar recursos de NLTK o el modelo de sentimientos: {e}")
+        amistad = resultado_precalculado('amistad', _df_chat, calcular_amistad)
+    except LookupError as e:
+        st.error(f"Error al cargar recursos de NLTK: {e}")
         return
 
-    # --- MÉTRICA 1: Vibra Positiva (Global) ---
-    # Esta métrica mide el sentimiento general de toda la conversación
-    try:
-        resultados_sent = sentiment_analyzer.predict(_df_chat['Mensaje'].tolist())
-        sentimientos = [r.output for r in resultados_sent]
-        conteo_sent = pd.Series(sentimientos).value_counts(normalize=True)
-        vibra_positiva = conteo_sent.get('POS', 0) * 100
-    except Exception as e:
-        st.warning(f"No se pudo calcular la vibra positiva: {e}")
-        vibra_positiva = 0.0
+    if amistad['error_sentimiento']:
+        st.warning(f"No se pudo calcular la vibra positiva: {amistad['error_sentimiento']}")
+    elif amistad['resueltos_por_reglas']:
+        st.caption(f"{amistad['resueltos_por_reglas'] / len(_df_chat):.1%} de los mensajes "
+                   "se clasificaron con reglas sin pasar por el modelo de sentimientos.")
 
-    # --- Procesamiento por Autor (para métricas 2, 3 y 4) ---
-    datos_autores = {}
-    
-    for autor in autores_principales:
-        df_autor = _df_chat[_df_chat['Autor'] == autor]
-        mensajes_autor = df_autor['Mensaje'].tolist()
-        count_autor = len(mensajes_autor)
-        
-        if count_autor == 0:
-            continue
-            
-        # Sentimiento por autor
-        sent_autor = sentiment_analyzer.predict(mensajes_autor)
-        sent_outputs = [r.output for r in sent_autor]
-        prop_pos = sent_outputs.count('POS') / count_autor
-        
-        # Palabras clave por autor
-        top_palabras = _limpiar_y_contar_palabras(mensajes_autor, stop_words_es)
-        
-        datos_autores[autor] = {
-            'count': count_autor,
-            'prop_positiva': prop_pos,
-            'palabras_set': top_palabras
-        }
-    
-    # Filtrar autores que no tengan datos (aunque value_counts debería prevenir esto)
-    datos_autores_validos = [d for d in datos_autores.values() if d['count'] > 0]
-    
-    if len(datos_autores_validos) < 2:
-        st.error("No hay suficientes datos de autores (con mensajes válidos) para comparar.")
-        return
-
-    # --- MÉTRICA 2: Balance de Participación ---
-    # Compara al que más habla con el que menos habla.
-    counts = [d['count'] for d in datos_autores_validos]
-    balance_participacion = (min(counts) / max(counts)) * 100 if max(counts) > 0 else 0.0
-
-    # --- MÉTRICA 3: Sincronía Emocional ---
-    # Mide la desviación estándar de la positividad.
-    # Una desviación baja (cercana a 0) es alta sincronía (todos sienten parecido).
-    props_positivas = [d['prop_positiva'] for d in datos_autores_validos]
-    std_dev_sent = np.std(props_positivas)
-    # Convertimos la desviación (0=bueno, 1=malo) a un puntaje (100=bueno, 0=malo)
-    sincronia_emocional = max(0.0, (1 - std_dev_sent) * 100.0)
-
-    # --- MÉTRICA 4: Intereses Comunes ---
-    # Mide el % de palabras clave que TODOS los autores comparten (Jaccard Index).
-    lista_sets_palabras = [d['palabras_set'] for d in datos_autores_validos if d['palabras_set']]
-    
-    if not lista_sets_palabras or len(lista_sets_palabras) < num_autores:
-        # Si alguien no dijo palabras clave, los intereses comunes (de todos) es 0
-        intereses_comunes = 0.0
-    else:
-        interseccion = set.intersection(*lista_sets_palabras)
-        union = set.union(*lista_sets_palabras)
-        
-        intereses_comunes = (len(interseccion) / len(union)) * 100 if len(union) > 0 else 0.0
-
-    # --- CÁLCULO FINAL: Nivel de Amistad ---
-    nivel_amistad_total = (
-        vibra_positiva + balance_participacion + 
-        sincronia_emocional + intereses_comunes
-    ) / 4.0
+    nivel_amistad_total = amistad['nivel_amistad']
+    autores = amistad['autores']
+    sim_intereses, sim_sentimiento = amistad['sim_intereses'], amistad['sim_sentimiento']
+    dinamica = amistad['dinamica']
 
     # --- Graficar (GRÁFICO 1: Barras de Amistad) ---
     st.write("--- Pilares de la Amistad del Grupo ---")
     data = {
-        'Métrica': [
-            'Intereses Comunes', 
-            'Sincronía Emocional', 
-            'Balance de Participación', 
-            'Vibra Positiva General'
-        ],
-        'Puntaje (%)': [
-            intereses_comunes, 
-            sincronia_emocional, 
-            balance_participacion, 
-            vibra_positiva
-        ]
+        'Métrica': list(amistad['metricas']),
+        'Puntaje (%)': list(amistad['metricas'].values())
     }
     df_metricas = pd.DataFrame(data).set_index('Métrica').sort_values('Puntaje (%)', ascending=True)
 
@@ -255,4 +244,36 @@ def analizar_nivel_amistad(_df_chat):
     
     plt.box(False)
     
-    st.pyplot(fig_gauge)
\ No newline at end of file
+    st.pyplot(fig_gauge)
+
+    # --- Graficar (GRÁFICO 3: Mapas de Afinidad entre Autores, agrupados) ---
+    st.write("--- Afinidad entre Pares de Autores ---")
+    afinidad = sim_intereses if sim_sentimiento is None else (sim_intereses + sim_sentimiento) / 2
+    orden = orden_agrupado(afinidad)
+    nombres = [autores[i] for i in orden]
+    mostrar_nombres = len(nombres) <= 60
+
+    mapas = [('Intereses Comunes', sim_intereses)]
+    if sim_sentimiento is not None:
+        mapas.append(('Sincronía Emocional', sim_sentimiento))
+
+    columnas = st.columns(len(mapas))
+    for columna, (titulo, matriz) in zip(columnas, mapas):
+        with columna:
+            lado = min(12, max(5, len(nombres) * 0.3))
+            fig_mapa, ax_mapa = plt.subplots(figsize=(lado, lado))
+            sns.heatmap(
+                pd.DataFrame(matriz[np.ix_(orden, orden)], index=nombres, columns=nombres),
+                cmap="Reds", vmin=0, vmax=1, square=True, ax=ax_mapa,
+                xticklabels=mostrar_nombres, yticklabels=mostrar_nombres,
+                cbar_kws={'label': 'Similitud'}
+            )
+            ax_mapa.set_title(titulo)
+            st.pyplot(fig_mapa)
+
+    # --- Dinámica de la Conversación (tablas) ---
+    st.write(f"--- Dinámica de la Conversación ({dinamica['conversaciones']} conversaciones) ---")
+    st.write("Quién responde a quién y con qué rapidez:")
+    st.dataframe(dinamica['pares'].round(1), use_container_width=True)
+    st.write("Turnos y conversaciones iniciadas por autor:")
+    st.dataframe(dinamica['autores'].round(1), use_container_width=True)
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from Analisis.Utils.aux_opciones import leer_chat
+from Analisis.Utils.exportacion import cargar_parquet
+from Analisis.Utils.resultados_modelo import TAREAS, calcular_probabilidades, distribucion_etiquetas, etiquetas
+from Analisis.Opciones.analizar_nivel_amistad_03 import calcular_metricas_amistad
+from Analisis.Opciones.sentimientos_02 import TRADUCCIONES_EMOCIONES
+from Utils.Metodos import obtener_servidor_inferencia
+from Utils.memoria_sesiones import guardar_dato_sesion, obtener_dato_sesion, id_sesion_actual
+
+# --- Comparación de Varios Chats ---
+# Cada chat se analiza en un hilo de un pool acotado. El trabajo pesado no compite
+# por el GIL: el parseo de chats grandes usa su propio pool de procesos y la
+# inferencia la agrupa en lotes el servidor compartido. Cada resumen se guarda en el
+# registro de memoria de la sesión desde el propio hilo del pool, así que un rerun
+# (añadir o quitar un archivo a mitad del análisis) no pierde los chats ya analizados.
+
+# Chats que se analizan a la vez
+HILOS_COMPARACION = int(os.environ.get("WHATSENTICS_HILOS_COMPARACION", "3"))
+# Autores que se muestran por chat
+TOP_AUTORES = 10
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+# Serializa las actualizaciones de los resúmenes de la sesión (las hacen varios hilos)
+_lock_resumenes = threading.Lock()
+
+
+@st.cache_resource
+def obtener_pool_comparacion():
+    """Pool de hilos que analiza los chats a comparar (compartido por todas las sesiones)."""
+    return ThreadPoolExecutor(max_workers=HILOS_COMPARACION, thread_name_prefix="comparacion")
+
+
+def clave_archivo(contenido_bytes):
+    """Huella del archivo subido: identifica el chat sin tener que volver a parsearlo."""
+    return hashlib.sha1(contenido_bytes).hexdigest()
+
+
+def analizar_chat_para_comparacion(nombre, contenido_bytes):
+    """
+    Analiza un chat completo sin Streamlit (se ejecuta en un hilo del pool).
+    Devuelve solo el resumen que necesita la comparación, no el chat en sí.
+    """
+    if nombre.endswith('.parquet'):
+        # Exportado por la app: reutiliza las predicciones guardadas
+        df_chat, resultados = cargar_parquet(contenido_bytes)
+    else:
+        df_chat, resultados = leer_chat(nombre, contenido_bytes), {}
+    for tarea in TAREAS:
+        if tarea not in resultados:
+            resultados[tarea] = calcular_probabilidades(df_chat['Mensaje'], tarea)
+
+    timestamps = pd.to_datetime(df_chat['Timestamp'])
+    actividad = (
+        pd.crosstab(timestamps.dt.hour, timestamps.dt.dayofweek)
+        .reindex(index=range(24), columns=range(7), fill_value=0)
+    )
+    actividad.columns = DIAS_SEMANA
+
+    conteo_emociones, _ = distribucion_etiquetas(resultados['emotion'])
+    amistad = calcular_metricas_amistad(df_chat, etiquetas(resultados['sentiment'])) \
+        if df_chat['Autor'].nunique() >= 2 else None
+
+    return {
+        'nombre': nombre,
+        'mensajes': len(df_chat),
+        'autores': df_chat['Autor'].value_counts(),
+        'actividad': actividad,
+        'emociones': conteo_emociones / max(conteo_emociones.sum(), 1) * 100,
+        'amistad': None if amistad is None else {**amistad['metricas'], 'Nivel de Amistad': amistad['nivel_amistad']},
+    }
+
+
+def _analizar_y_guardar(id_sesion, clave, nombre, contenido_bytes):
+    """
+    Trabajo del pool: analiza un chat y guarda su resumen (o el error) en el registro
+    de la sesión antes de terminar, aunque el script que lo pidió ya no esté esperando.
+    """
+    try:
+        clave_dato, valor = 'comparacion_chats', analizar_chat_para_comparacion(nombre, contenido_bytes)
+    except Exception as e:
+        clave_dato, valor = 'comparacion_errores', f"{nombre}: {e}"
+    with _lock_resumenes:
+        datos = dict(obtener_dato_sesion(clave_dato, {}, id_sesion=id_sesion))
+        datos[clave] = valor
+        guardar_dato_sesion(clave_dato, datos, id_sesion=id_sesion)
+
+
+def _descartar_quitados(archivos):
+    """Quita de la sesión los resúmenes y errores de los chats que ya no están subidos."""
+    with _lock_resumenes:
+        for clave_dato in ('comparacion_chats', 'comparacion_errores'):
+            datos = obtener_dato_sesion(clave_dato, {})
+            if any(clave not in archivos for clave in datos):
+                guardar_dato_sesion(clave_dato, {c: v for c, v in datos.items() if c in archivos})
+
+
+def actualizar_resumenes(archivos):
+    """
+    Sincroniza los resúmenes guardados en la sesión con los archivos subidos:
+    solo se analizan los chats nuevos y se descartan los que se quitaron.
+    """
+    archivos = {clave_archivo(a.getvalue()): a for a in archivos}
+    _descartar_quitados(archivos)
+    resumenes, errores = obtener_dato_sesion('comparacion_chats', {}), obtener_dato_sesion('comparacion_errores', {})
+
+    # Análisis lanzados en ejecuciones anteriores del script que aún no han terminado
+    en_curso = st.session_state.setdefault('comparacion_en_curso', {})
+    for clave in [c for c, futuro in en_curso.items() if futuro.done()]:
+        del en_curso[clave]
+
+    pendientes = {clave: a for clave, a in archivos.items()
+                  if clave not in resumenes and clave not in errores and clave not in en_curso}
+    if pendientes:
+        obtener_servidor_inferencia()  # se crea en el hilo principal, los hilos lo reutilizan
+        pool, id_sesion = obtener_pool_comparacion(), id_sesion_actual()
+        for clave, a in pendientes.items():
+            en_curso[clave] = pool.submit(_analizar_y_guardar, id_sesion, clave, a.name, a.getvalue())
+
+    esperando = {futuro for clave, futuro in en_curso.items() if clave in archivos}
+    if esperando:
+        total = len(esperando)
+        progreso = st.progress(0.0, text=f"Analizando {total} chat(s)...")
+        while esperando:
+            _, esperando = wait(esperando, return_when=FIRST_COMPLETED)
+            hechos = total - len(esperando)
+            progreso.progress(hechos / total, text=f"Analizados {hechos} de {total} chats")
+        progreso.empty()
+        resumenes, errores = obtener_dato_sesion('comparacion_chats', {}), obtener_dato_sesion('comparacion_errores', {})
+
+    # Mismo orden en el que se subieron los archivos
+    return ([resumenes[clave] for clave in archivos if clave in resumenes],
+            [errores[clave] for clave in archivos if clave in errores])
+
+
+def comparar_chats(archivos):
+    """
+    Vista de comparación: autores, actividad, emociones y amistad de varios chats lado a lado.
+    """
+    st.subheader("Comparación de Chats")
+
+    resumenes, errores = actualizar_resumenes(archivos)
+    for error in errores:
+        st.warning(f"No se pudo analizar {error}")
+    if len(resumenes) < 2:
+        st.info("Sube al menos dos chats para compararlos.")
+        return
+
+    nombres = [r['nombre'].rsplit('.', 1)[0] for r in resumenes]
+
+    # --- Resumen general ---
+    st.dataframe(pd.DataFrame({
+        'Mensajes': [r['mensajes'] for r in resumenes],
+        'Autores': [len(r['autores']) for r in resumenes],
+        'Nivel de Amistad (%)': [r['amistad']['Nivel de Amistad'] if r['amistad'] else np.nan for r in resumenes],
+    }, index=nombres).round(1), use_container_width=True)
+
+    # --- Autores por chat ---
+    st.write("--- Mensajes por Autor ---")
+    for fila in range(0, len(resumenes), 3):
+        columnas = st.columns(3)
+        for columna, resumen, nombre in zip(columnas, resumenes[fila:fila + 3], nombres[fila:fila + 3]):
+            with columna:
+                st.markdown(f"**{nombre}**")
+                st.bar_chart(resumen['autores'].head(TOP_AUTORES))
+
+    # --- Actividad (porcentaje de mensajes por hora y día, comparable entre chats) ---
+    st.write("--- Mapas de Actividad (% de mensajes) ---")
+    for fila in range(0, len(resumenes), 3):
+        columnas = st.columns(3)
+        for columna, resumen, nombre in zip(columnas, resumenes[fila:fila + 3], nombres[fila:fila + 3]):
+            with columna:
+                actividad = resumen['actividad'] / max(resumen['actividad'].to_numpy().sum(), 1) * 100
+                fig, ax = plt.subplots(figsize=(6, 7))
+                sns.heatmap(actividad, cmap="Reds", ax=ax, cbar_kws={'label': '% de mensajes'})
+                ax.set_title(nombre)
+                ax.set_xlabel('Día de la Semana')
+                ax.set_ylabel('Hora del Día')
+                st.pyplot(fig)
+                plt.close(fig)
+
+    # --- Emociones ---
+    st.write("--- Distribución de Emociones (% de mensajes) ---")
+    emociones = pd.DataFrame([r['emociones'] for r in resumenes], index=nombres).fillna(0)
+    emociones = emociones.rename(columns=TRADUCCIONES_EMOCIONES)
+    fig, ax = plt.subplots(figsize=(12, 5))
+    emociones.T.plot(kind='bar', ax=ax, rot=0)
+    ax.set_ylabel('% de Mensajes')
+    ax.legend(title='Chat')
+    st.pyplot(fig)
+    plt.close(fig)
+
+    # --- Amistad ---
+    con_amistad = [(n, r['amistad']) for n, r in zip(nombres, resumenes) if r['amistad']]
+    if con_amistad:
+        st.write("--- Pilares de la Amistad ---")
+        amistad = pd.DataFrame([a for _, a in con_amistad], index=[n for n, _ in con_amistad])
+        fig, ax = plt.subplots(figsize=(12, 5))
+        amistad.T.plot(kind='barh', ax=ax, xlim=(0, 100))
+        ax.set_xlabel('Puntaje (0-100)')
+        ax.legend(title='Chat')
+        st.pyplot(fig)
+        plt.close(fig)
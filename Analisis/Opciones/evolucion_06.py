@@ -0,0 +1,104 @@
+import streamlit as st
+import pandas as pd
+from Analisis.Utils.lineas_tiempo import FRECUENCIAS, calcular_lineas_tiempo, leer_avance
+from Analisis.Utils.precalculo import resultado_precalculado
+from Analisis.Opciones.sentimientos_02 import TRADUCCIONES_EMOCIONES, COLORES_EMOCIONES
+
+TRADUCCIONES_SENTIMIENTOS = {'POS': 'Positivo 😊', 'NEU': 'Neutral 😐', 'NEG': 'Negativo 😠'}
+COLORES_SENTIMIENTOS = {'POS': '#2E8B57', 'NEU': '#A9A9A9', 'NEG': '#DC143C'}
+
+# Tarea del modelo -> (nombre, traducciones, colores)
+VISTAS_TAREA = {
+    'emotion': ("Emociones", TRADUCCIONES_EMOCIONES, COLORES_EMOCIONES),
+    'sentiment': ("Sentimientos", TRADUCCIONES_SENTIMIENTOS, COLORES_SENTIMIENTOS),
+}
+
+
+def _grafico(contenedor, serie, tarea, porcentaje=True):
+    _, traducciones, colores = VISTAS_TAREA[tarea]
+    contenedor.line_chart(
+        serie.rename(columns=traducciones),
+        color=[colores.get(c, '#808080') for c in serie.columns],
+        y_label="% de mensajes" if porcentaje else "Mensajes",
+    )
+
+
+def analizar_evolucion(_df_chat):
+    """
+    Opción 6: Evolución de emociones y sentimientos en el tiempo (por día, semana
+    o mes, por autor y con ventana móvil). No se cachea con st.cache_data: los
+    controles solo recalculan la vista desde el conteo diario guardado.
+    """
+    st.subheader("Evolución de Emociones y Sentimientos 📈")
+
+    if _df_chat.empty:
+        st.warning("No hay datos de chat para analizar.")
+        return
+
+    # Si el chat aún no tiene las predicciones de los modelos, se calculan por lotes
+    # y la gráfica se va completando con cada uno: aquí mismo si el precálculo aún
+    # estaba en cola, o leyendo el avance que publica el hilo de fondo si ya empezó
+    progreso, parcial = st.empty(), st.empty()
+
+    def mostrar_avance(tarea, serie, hechos, total):
+        nombre = VISTAS_TAREA[tarea][0]
+        progreso.progress(hechos / total, text=f"Analizando {nombre.lower()}: {hechos} de {total} mensajes...")
+        _grafico(parcial, serie, tarea)
+
+    mostrado = {}
+
+    def al_esperar():
+        avance = leer_avance(_df_chat)
+        if avance is not None and mostrado.get('lote') != (avance['tarea'], avance['hechos']):
+            mostrado['lote'] = (avance['tarea'], avance['hechos'])
+            mostrar_avance(avance['tarea'], avance['serie'], avance['hechos'], avance['total'])
+
+    agregados = resultado_precalculado(
+        'lineas_tiempo', _df_chat, calcular_lineas_tiempo, al_esperar=al_esperar,
+        al_lote=lambda tarea, agregado, hechos, total: mostrar_avance(tarea, agregado.serie('MS'), hechos, total),
+    )
+    progreso.empty()
+    parcial.empty()
+
+    # --- Controles (no vuelven a ejecutar los modelos) ---
+    col_tarea, col_periodo, col_autor = st.columns(3)
+    with col_tarea:
+        tarea = st.radio("Qué mostrar", options=list(VISTAS_TAREA), format_func=lambda t: VISTAS_TAREA[t][0],
+                         horizontal=True, key='evolucion_tarea')
+    with col_periodo:
+        dias = (_df_chat['Timestamp'].max() - _df_chat['Timestamp'].min()).days
+        periodo = st.selectbox("Agrupar por", options=list(FRECUENCIAS),
+                               index=2 if dias > 365 else 1 if dias > 60 else 0, key='evolucion_periodo')
+    with col_autor:
+        autor = st.selectbox("Autor", options=["Todos"] + agregados[tarea].autores(), key='evolucion_autor')
+
+    col_ventana, col_porcentaje = st.columns([2, 1])
+    with col_ventana:
+        ventana = st.slider("Ventana móvil (periodos)", min_value=1, max_value=12, value=1,
+                            key='evolucion_ventana',
+                            help="Cada punto suma los mensajes de los últimos N periodos, para suavizar la curva.")
+    with col_porcentaje:
+        porcentaje = st.checkbox("Mostrar en %", value=True, key='evolucion_porcentaje',
+                                 help="Reparto entre clases en cada periodo, en lugar del número de mensajes.")
+
+    serie = agregados[tarea].serie(
+        FRECUENCIAS[periodo], autor=None if autor == "Todos" else autor, ventana=ventana, porcentaje=porcentaje
+    )
+    if serie.dropna(how='all').empty:
+        st.info("No hay mensajes para esta selección.")
+        return
+
+    nombre = VISTAS_TAREA[tarea][0]
+    st.markdown(f"#### {nombre} por {periodo.lower()}" + (f" de {autor}" if autor != "Todos" else ""))
+    _grafico(st, serie, tarea, porcentaje)
+
+    # Periodo con más peso de cada clase
+    st.markdown("##### Momentos destacados")
+    valores = serie.fillna(0)
+    valores = valores.loc[:, valores.max() > 0]
+    destacados = pd.DataFrame({
+        'Periodo con más peso': valores.idxmax().dt.strftime('%d/%m/%Y'),
+        '% de mensajes' if porcentaje else 'Mensajes': valores.max().round(1),
+    }).rename(index=VISTAS_TAREA[tarea][1])
+    destacados.index.name = 'Clase'
+    st.dataframe(destacados, use_container_width=True)
@@ -10,13 +10,19 @@ from nltk.corpus import stopwords
 from collections import Counter
 import string
 import os
+from Analisis.Utils.precalculo import resultado_precalculado
+
+
+def calcular_autores(df_chat, id_sesion=None):
+    """Mensajes por autor (se precalcula en segundo plano al cargar el chat)."""
+    return df_chat['Autor'].value_counts()
 
 
 @st.cache_data
-def mostrar_analisis_conversacion(_df_chat):
+def mostrar_analisis_conversacion(_df_chat, huella=None):
     """
     Opción 1: Muestra mensajes por autor y genera un gráfico.
-    El _df_chat es un parámetro "hashable" para la caché.
+    El _df_chat no entra en la clave de la caché: la clave es la `huella` del chat.
     """
     st.subheader("Análisis de Autores")
     
@@ -25,14 +31,14 @@ def mostrar_analisis_conversacion(_df_chat):
         return
 
     # Estadística básica
-    mensajes_por_autor = _df_chat['Autor'].value_counts()
+    mensajes_por_autor = resultado_precalculado('autores', _df_chat, calcular_autores)
     st.write("Total de Mensajes por Autor:")
     st.dataframe(mensajes_por_autor)
 
     # Gráfico simple
     st.write("--- Gráfico de mensajes por autor ---")
     fig, ax = plt.subplots(figsize=(10, max(6, len(mensajes_por_autor) * 0.5)))
-    sns.countplot(y=_df_chat['Autor'], order=mensajes_por_autor.index, palette="viridis", ax=ax)
+    sns.barplot(x=mensajes_por_autor.values, y=mensajes_por_autor.index, palette="viridis", ax=ax)
     ax.set_title('Número de Mensajes por Autor')
     ax.set_xlabel('Cantidad de Mensajes')
     ax.set_ylabel('Autor')
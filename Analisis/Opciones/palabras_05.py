@@ -4,9 +4,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import nltk
 from nltk.corpus import stopwords
-from collections import Counter
-import string
-import emoji # ¡Importante! Asegúrate de que esta línea esté activa
+from Analisis.Utils.conteo_aproximado import contar_palabras_y_emojis, UMBRAL_CONTEO_EXACTO
+from Analisis.Utils.precalculo import resultado_precalculado
 from wordcloud import WordCloud 
 
 # Descargar stopwords de NLTK (solo la primera vez)
@@ -26,8 +25,28 @@ def configurar_grafico_palabras():
     plt.rc('xtick', labelsize=12)
     plt.rc('ytick', labelsize=12)
 
+# Palabras de chat que no aportan significado (además de las stopwords de NLTK)
+STOP_WORDS_CHAT = {
+    'que', 'qué', 'con', 'para', 'pero', 'por', 'del', 'los', 'las', 'como', 'cómo',
+    '<multimedia', 'omitido>', 'audio', 'jaja', 'jajaja', 'sticker', 'ok', 
+    'vale', 'si', 'no', 'ya', 'así', 'va', 'dos', 'ser', 'es', 'está', 'https',
+    'http', 'www', 'com', 'message', 'deleted'
+}
+
+
+def calcular_conteos_palabras(df_chat, id_sesion=None):
+    """
+    Palabras y emojis más usados, globales y por autor (se precalculan en segundo
+    plano al cargar el chat). Los chats grandes usan el conteo aproximado.
+    """
+    stop_words_total = set(stopwords.words('spanish')).union(STOP_WORDS_CHAT)
+    exacto = len(df_chat) < UMBRAL_CONTEO_EXACTO
+    conteos = contar_palabras_y_emojis(df_chat['Mensaje'], df_chat['Autor'], stop_words_total, exacto=exacto)
+    return {**conteos, 'exacto': exacto}
+
+
 @st.cache_data
-def analizar_palabras_y_emojis(_df_chat):
+def analizar_palabras_y_emojis(_df_chat, huella=None):
     """
     Opción 5: Analiza las palabras y emojis más comunes (global y por contacto).
     """
@@ -40,28 +59,23 @@ def analizar_palabras_y_emojis(_df_chat):
         st.warning("No hay datos de chat para analizar.")
         return
 
-    # Combinar todos los mensajes en un solo texto (para análisis global)
-    texto_completo = ' '.join(_df_chat['Mensaje']).lower()
+    # --- Conteo de palabras y emojis (global y por contacto) en una sola pasada ---
+    # Los chats muy grandes usan el conteo aproximado (Space-Saving) con memoria acotada.
+    conteos = resultado_precalculado('palabras', _df_chat, calcular_conteos_palabras)
+    exacto = conteos['exacto']
+    if not exacto:
+        st.info(
+            f"Chat muy grande ({len(_df_chat)} mensajes): las frecuencias son aproximadas. "
+            f"Cada una puede estar sobreestimada como mucho en su 'Error Máx.' "
+            f"(palabras: ±{conteos['palabras'].cota_error()}, emojis: ±{conteos['emojis'].cota_error()})."
+        )
 
     # --- 1. Análisis de Palabras (Global) ---
     st.markdown("#### Palabras Más Comunes (excluyendo artículos y conectores)")
 
-    # (Tu código de stopwords y limpieza... se mantiene igual)
-    stop_words_es = set(stopwords.words('spanish'))
-    stop_words_chat = {
-        'que', 'qué', 'con', 'para', 'pero', 'por', 'del', 'los', 'las', 'como', 'cómo',
-        '<multimedia', 'omitido>', 'audio', 'jaja', 'jajaja', 'sticker', 'ok', 
-        'vale', 'si', 'no', 'ya', 'así', 'va', 'dos', 'ser', 'es', 'está', 'https',
-        'http', 'www', 'com', 'message', 'deleted'
-    }
-    stop_words_total = stop_words_es.union(stop_words_chat)
-    texto_limpio = texto_completo.translate(str.maketrans('', '', string.punctuation + '¿¡'))
-    palabras_filtradas = [
-        p for p in texto_limpio.split() 
-        if p not in stop_words_total and len(p) > 2 and not p.isdigit()
-    ]
+    top_palabras = conteos['palabras'].top(200)  # WordCloud dibuja como mucho 200 palabras
     
-    if not palabras_filtradas:
+    if not top_palabras:
         st.info("No se encontraron palabras significativas para analizar.")
         # No retornamos aquí, aún puede haber emojis
     else:
@@ -72,9 +86,8 @@ def analizar_palabras_y_emojis(_df_chat):
                 width=800, 
                 height=400, 
                 background_color='white', 
-                colormap='viridis',
-                stopwords=stop_words_total
-            ).generate(' '.join(palabras_filtradas))
+                colormap='viridis'
+            ).generate_from_frequencies({p: c for p, c, _ in top_palabras})
 
             fig_wc, ax = plt.subplots(figsize=(12, 6))
             ax.imshow(wordcloud, interpolation='bilinear')
@@ -84,8 +97,7 @@ def analizar_palabras_y_emojis(_df_chat):
             st.error(f"Error al generar la nube de palabras: {e}")
             # Mostrar un gráfico de barras como alternativa
             st.markdown("##### Top 20 Palabras (Gráfico Alternativo)")
-            conteo_palabras = Counter(palabras_filtradas).most_common(20)
-            df_palabras = pd.DataFrame(conteo_palabras, columns=['Palabra', 'Frecuencia'])
+            df_palabras = pd.DataFrame(top_palabras[:20], columns=['Palabra', 'Frecuencia', 'Error Máx.'])
             configurar_grafico_palabras()
             fig_bar, ax_bar = plt.subplots()
             sns.barplot(data=df_palabras, y='Palabra', x='Frecuencia', ax=ax_bar, palette='viridis')
@@ -95,19 +107,16 @@ def analizar_palabras_y_emojis(_df_chat):
     # --- 2. Análisis de Emojis (Global) ---
     st.markdown("--- \n #### Emojis Más Usados (Global)")
     
-    # Usamos la misma lógica que tenías para el análisis global
-    emojis_encontrados_global = []
-    for char in texto_completo:
-        if emoji.is_emoji(char):
-            emojis_encontrados_global.append(char)
+    conteo_emojis_global = conteos['emojis'].top(15)
             
-    if not emojis_encontrados_global:
+    if not conteo_emojis_global:
         st.info("No se encontraron emojis en esta conversación.")
         return # Si no hay emojis en total, no podemos analizar por contacto
 
-    # Contar y mostrar los emojis globales
-    conteo_emojis_global = Counter(emojis_encontrados_global).most_common(15)
-    df_emojis_global = pd.DataFrame(conteo_emojis_global, columns=['Emoji', 'Frecuencia'])
+    # Mostrar los emojis globales
+    df_emojis_global = pd.DataFrame(conteo_emojis_global, columns=['Emoji', 'Frecuencia', 'Error Máx.'])
+    if exacto:
+        df_emojis_global = df_emojis_global.drop(columns=['Error Máx.'])
     
     col1, col2 = st.columns([1, 2])
     with col1:
@@ -116,49 +125,29 @@ def analizar_palabras_y_emojis(_df_chat):
     
     with col2:
         st.markdown("##### Gráfico Global de Emojis")
-        df_chart_emojis = df_emojis_global.set_index('Emoji')
+        df_chart_emojis = df_emojis_global.set_index('Emoji')[['Frecuencia']]
         st.bar_chart(df_chart_emojis)
 
-    # --- 3. ANÁLISIS POR CONTACTO (NUEVO) ---
+    # --- 3. ANÁLISIS POR CONTACTO ---
     st.markdown("--- \n #### Análisis de Emojis por Contacto")
 
-    autores = _df_chat['Autor'].unique()
     resultados_autores = []
-
-    for autor in autores:
-        # 1. Filtrar mensajes del autor
-        df_autor = _df_chat[_df_chat['Autor'] == autor]
-        
-        # 2. Unir todos sus mensajes
-        texto_autor = ' '.join(df_autor['Mensaje'])
-        
-        # 3. Encontrar todos los emojis de ESE autor
-        emojis_autor = []
-        for char in texto_autor:
-            if emoji.is_emoji(char):
-                emojis_autor.append(char)
-        
-        total_emojis = len(emojis_autor)
-        
-        # 4. Encontrar el emoji favorito
-        if total_emojis == 0:
-            emoji_favorito = "N/A"
-            conteo_favorito = 0
-        else:
-            conteo = Counter(emojis_autor).most_common(1)
-            emoji_favorito = conteo[0][0]
-            conteo_favorito = conteo[0][1]
-            
-        # 5. Guardar resultados
+    for autor, conteo_emojis_autor in conteos['emojis_autor'].items():
+        favorito = conteo_emojis_autor.top(1)
+        palabra = conteos['palabras_autor'][autor].top(1)
         resultados_autores.append({
             'Autor': autor,
-            'Total Emojis': total_emojis,
-            'Emoji Favorito': emoji_favorito,
-            'Veces Usado': conteo_favorito
+            'Total Emojis': conteos['emojis_por_autor'][autor],
+            'Emoji Favorito': favorito[0][0] if favorito else "N/A",
+            'Veces Usado': favorito[0][1] if favorito else 0,
+            'Palabra Favorita': palabra[0][0] if palabra else "N/A",
+            'Error Máx.': max(favorito[0][2] if favorito else 0, palabra[0][2] if palabra else 0),
         })
 
     # Convertir a DataFrame para mostrarlo
     df_autores = pd.DataFrame(resultados_autores)
+    if exacto:
+        df_autores = df_autores.drop(columns=['Error Máx.'])
     
     # Ordenar para ver quién usó más emojis en total
     df_autores = df_autores.sort_values(by='Total Emojis', ascending=False)
@@ -10,13 +10,43 @@ from nltk.corpus import stopwords
 from collections import Counter
 import string
 import os
-from Utils.Metodos import cargar_modelo_emociones
+from Analisis.Utils.resultados_modelo import (
+    obtener_probabilidades, distribucion_etiquetas, auditar_prefiltro, CONFIANZA_POR_MODO
+)
+from Analisis.Utils.precalculo import esperar_precalculo
+from Analisis.Utils.lineas_tiempo import esperar_probabilidades
+
+# Nombres y colores de las clases del modelo de emociones (también los usa la comparación de chats)
+TRADUCCIONES_EMOCIONES = {
+    'joy': 'Alegría 😊',
+    'sadness': 'Tristeza 😢',
+    'anger': 'Enojo 😠',
+    'fear': 'Miedo 😱',
+    'surprise': 'Sorpresa 😮',
+    'disgust': 'Asco 🤢',
+    'others': 'Otras 😐'
+}
+COLORES_EMOCIONES = {
+    'joy': '#FFD700', 'sadness': '#4169E1', 'anger': '#DC143C', 'fear': '#8A2BE2',
+    'surprise': '#FF8C00', 'disgust': '#2E8B57', 'others': '#A9A9A9'
+}
+
+
+def precalcular_emociones(df_chat, id_sesion=None):
+    """
+    Ejecuta el modelo de emociones en segundo plano al cargar el chat. No devuelve
+    nada: las probabilidades quedan guardadas en la sesión (ver resultados_modelo.py).
+    Normalmente ya las ha calculado el precálculo de las líneas de tiempo.
+    """
+    esperar_probabilidades(df_chat, id_sesion=id_sesion)
+    obtener_probabilidades(df_chat, 'emotion', id_sesion=id_sesion)
 
 
-@st.cache_data
 def analizar_emociones(_df_chat):
     """
     Opción 2: Procesa el chat, analiza las emociones y genera un gráfico.
+    No se cachea con st.cache_data: la inferencia ya queda guardada en la sesión
+    (matriz de probabilidades) y los controles recalculan la distribución al instante.
     """
     st.subheader("Análisis de Emociones")
 
@@ -26,34 +56,62 @@ def analizar_emociones(_df_chat):
 
     st.write(f"Se analizarán {len(_df_chat)} mensajes...")
 
-    # Cargar el modelo (lo tomará de la caché si ya existe)
-    emotion_analyzer = cargar_modelo_emociones()
-
-    # Predecir las emociones
-    resultados = emotion_analyzer.predict(_df_chat['Mensaje'].tolist())
-    emociones_predichas = [r.output for r in resultados]
-    
-    conteo_emociones = pd.Series(emociones_predichas).value_counts()
-
-    # Filtrar por las 5 emociones deseadas
-    emociones_deseadas = ['joy', 'sadness', 'anger', 'fear', 'surprise']
-    conteo_filtrado = conteo_emociones.reindex(emociones_deseadas, fill_value=0)
-
-    traducciones = {
-        'joy': 'Alegría 😊',
-        'sadness': 'Tristeza 😢',
-        'anger': 'Enojo 😠',
-        'fear': 'Miedo 😱',
-        'surprise': 'Sorpresa 😮'
-    }
-    conteo_grafico = conteo_filtrado.rename(index=traducciones)
-    colores = ['#FFD700', '#4169E1', '#DC143C', '#8A2BE2', '#FF8C00']
+    # Probabilidades por mensaje (se reutilizan si la sesión ya las tiene o vienen de un archivo exportado).
+    # Si el precálculo de fondo aún no terminó, se espera a él en lugar de repetir la inferencia.
+    esperar_precalculo('emociones', _df_chat)
+    resultado = obtener_probabilidades(_df_chat, 'emotion')
+    resueltos = resultado.get('resueltos_por_reglas', 0)
+    if resueltos:
+        st.caption(f"{resueltos / len(_df_chat):.1%} de los mensajes ({resueltos}) se resolvieron con reglas "
+                   "(risas, emojis, enlaces...) sin pasar por el modelo.")
+
+    # --- Controles de re-etiquetado (no vuelven a ejecutar el modelo) ---
+    col_modo, col_conf, col_otros = st.columns([2, 2, 1])
+    with col_modo:
+        modo = st.radio(
+            "Cómo asignar la emoción",
+            options=['argmax', 'umbral'],
+            format_func=lambda m: "Emoción más probable" if m == 'argmax' else "Todas las que superen el umbral",
+            key='emociones_modo'
+        )
+    with col_conf:
+        # Cada modo tiene su propio control: en 'umbral' un 0 contaría cada mensaje en todas las clases
+        umbral = modo == 'umbral'
+        confianza_min = st.slider(
+            "Umbral de probabilidad" if umbral else "Confianza mínima",
+            min_value=0.05 if umbral else 0.0, max_value=1.0, value=CONFIANZA_POR_MODO[modo], step=0.05,
+            key=f'emociones_confianza_{modo}',
+            help="Cada mensaje cuenta para todas las emociones cuya probabilidad supere este valor." if umbral
+            else "Los mensajes cuya probabilidad no alcance este valor no se cuentan."
+        )
+    with col_otros:
+        incluir_otros = st.checkbox("Incluir 'Otras'", value=True, key='emociones_otros',
+                                    help="La clase 'others' del modelo: mensajes sin una emoción clara.")
+
+    conteo_emociones, descartados = distribucion_etiquetas(resultado, confianza_min, incluir_otros, modo)
+    if descartados:
+        st.caption(f"{descartados} mensajes no alcanzan la confianza mínima y no se cuentan.")
+    if modo == 'umbral' and conteo_emociones.nunique() == 1 and conteo_emociones.iloc[0] == len(_df_chat):
+        st.warning("Con este umbral todos los mensajes cuentan para todas las emociones: súbelo para ver diferencias.")
+
+    colores = [COLORES_EMOCIONES.get(e, '#808080') for e in conteo_emociones.index]
+    conteo_grafico = conteo_emociones.rename(index=TRADUCCIONES_EMOCIONES)
 
     # Generar el gráfico
     st.write("--- Gráfico de distribución de emociones ---")
     fig, ax = plt.subplots(figsize=(10, 6))
     sns.barplot(x=conteo_grafico.index, y=conteo_grafico.values, palette=colores, ax=ax)
-    ax.set_title('Distribución de 5 Emociones en el Chat', fontsize=16)
+    ax.set_title('Distribución de Emociones en el Chat', fontsize=16)
     ax.set_xlabel('Emoción', fontsize=12)
     ax.set_ylabel('Cantidad de Mensajes', fontsize=12)
-    st.pyplot(fig)
\ No newline at end of file
+    st.pyplot(fig)
+
+    # --- Auditoría del pre-filtro de reglas ---
+    if resueltos:
+        with st.expander("🔎 Auditar el pre-filtro de reglas"):
+            st.write("Compara la etiqueta de las reglas con la del modelo en una muestra de mensajes "
+                     "resueltos por reglas (ejecuta el modelo sobre esa muestra).")
+            if st.button("Auditar 200 mensajes", key='auditar_prefiltro'):
+                with st.spinner("Ejecutando el modelo sobre la muestra..."):
+                    auditoria = auditar_prefiltro(_df_chat['Mensaje'].tolist(), 'emotion', muestra=200)
+                st.dataframe(auditoria.round(1), use_container_width=True)
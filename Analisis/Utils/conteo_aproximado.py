@@ -0,0 +1,154 @@
+import heapq
+import os
+import re
+import string
+import sys
+from collections import Counter
+
+import emoji
+
+# --- Conteo de Palabras y Emojis Más Frecuentes ---
+# Modo exacto: Counter con todos los elementos (memoria proporcional al vocabulario).
+# Modo aproximado: algoritmo Space-Saving con un número fijo de contadores, para
+# chats muy grandes. Cada frecuencia se reporta con su error máximo.
+
+# A partir de estos mensajes se usa el conteo aproximado
+UMBRAL_CONTEO_EXACTO = int(os.environ.get("WHATSENTICS_UMBRAL_CONTEO_EXACTO", "200000"))
+# Contadores del conteo aproximado: global y por autor
+CAPACIDAD_GLOBAL = int(os.environ.get("WHATSENTICS_CAPACIDAD_TOP", "2000"))
+CAPACIDAD_AUTOR = int(os.environ.get("WHATSENTICS_CAPACIDAD_TOP_AUTOR", "100"))
+
+TABLA_PUNTUACION = str.maketrans('', '', string.punctuation + '¿¡')
+# Emojis de un solo carácter (los mismos que detecta emoji.is_emoji carácter a carácter)
+RE_EMOJI = re.compile('[' + ''.join(re.escape(e) for e in emoji.EMOJI_DATA if len(e) == 1) + ']')
+
+
+class ConteoExacto:
+    """Conteo exacto con la misma interfaz que EspacioAhorro (error siempre 0)."""
+
+    def __init__(self):
+        self.conteo = Counter()
+        self.total = 0
+
+    def actualizar(self, elementos):
+        """Suma un Counter (o dict elemento -> veces) de un mensaje."""
+        self.conteo.update(elementos)
+        self.total += sum(elementos.values())
+
+    def top(self, n):
+        """Lista [(elemento, frecuencia, error_max)] de los `n` más frecuentes."""
+        return [(e, c, 0) for e, c in self.conteo.most_common(n)]
+
+    def cota_error(self):
+        return 0
+
+    @property
+    def nbytes(self):
+        """Bytes aproximados del conteo (para el registro de memoria de la sesión)."""
+        return sys.getsizeof(self.conteo) + sum(sys.getsizeof(e) + sys.getsizeof(c) for e, c in self.conteo.items())
+
+
+class EspacioAhorro:
+    """
+    Algoritmo Space-Saving (Metwally et al.) con `capacidad` contadores.
+
+    Cuando llega un elemento nuevo y no hay sitio, sustituye al de menor contador y
+    hereda su valor como error. Para cada elemento reportado la frecuencia real
+    está entre (frecuencia - error) y frecuencia, y el error nunca supera total / capacidad.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.contadores = {}  # elemento -> [frecuencia, error]
+        self._monticulo = []  # (frecuencia registrada, elemento); puede estar desactualizada
+        self.total = 0
+
+    def actualizar(self, elementos):
+        """Suma un Counter (o dict elemento -> veces) de un mensaje."""
+        for elemento, veces in elementos.items():
+            self.total += veces
+            contador = self.contadores.get(elemento)
+            if contador is not None:
+                contador[0] += veces
+            elif len(self.contadores) < self.capacidad:
+                self.contadores[elemento] = [veces, 0]
+                heapq.heappush(self._monticulo, (veces, elemento))
+            else:
+                minimo = self._extraer_minimo()
+                self.contadores[elemento] = [minimo + veces, minimo]
+                heapq.heappush(self._monticulo, (minimo + veces, elemento))
+
+    def _extraer_minimo(self):
+        """Quita el elemento con menor frecuencia y la devuelve."""
+        while True:
+            registrada, elemento = self._monticulo[0]
+            actual = self.contadores[elemento][0]
+            if registrada == actual:
+                heapq.heappop(self._monticulo)
+                del self.contadores[elemento]
+                return actual
+            # Las frecuencias solo crecen: se corrige la entrada y se sigue buscando
+            heapq.heapreplace(self._monticulo, (actual, elemento))
+
+    def top(self, n):
+        """Lista [(elemento, frecuencia, error_max)] de los `n` más frecuentes."""
+        mejores = heapq.nlargest(n, self.contadores.items(), key=lambda par: par[1][0])
+        return [(e, c, err) for e, (c, err) in mejores]
+
+    def cota_error(self):
+        """Error máximo de cualquier frecuencia reportada."""
+        if len(self.contadores) < self.capacidad:
+            return 0
+        return min(c for c, _ in self.contadores.values())
+
+    @property
+    def nbytes(self):
+        """Bytes aproximados de los contadores y el montículo (para el registro de memoria de la sesión)."""
+        contadores = sum(sys.getsizeof(e) + sys.getsizeof(c) + sum(map(sys.getsizeof, c))
+                         for e, c in self.contadores.items())
+        return (sys.getsizeof(self.contadores) + contadores
+                + sys.getsizeof(self._monticulo) + sum(sys.getsizeof(par) for par in self._monticulo))
+
+
+def _nuevo_contador(exacto, capacidad):
+    return ConteoExacto() if exacto else EspacioAhorro(capacidad)
+
+
+def contar_palabras_y_emojis(mensajes, autores, stop_words, exacto=True,
+                             capacidad_global=CAPACIDAD_GLOBAL, capacidad_autor=CAPACIDAD_AUTOR):
+    """
+    Recorre los mensajes uno a uno (sin unir el chat en un solo texto) y cuenta
+    palabras y emojis, globales y por autor.
+
+    Devuelve {'palabras', 'emojis', 'palabras_autor', 'emojis_autor', 'emojis_por_autor'}:
+    contadores (exactos o Space-Saving) y el total exacto de emojis de cada autor.
+    """
+    palabras, emojis = _nuevo_contador(exacto, capacidad_global), _nuevo_contador(exacto, capacidad_global)
+    palabras_autor, emojis_autor, emojis_por_autor = {}, {}, Counter()
+
+    for mensaje, autor in zip(mensajes, autores):
+        mensaje = mensaje.lower()
+        conteo_palabras = Counter(
+            p for p in mensaje.translate(TABLA_PUNTUACION).split()
+            if len(p) > 2 and p not in stop_words and not p.isdigit()
+        )
+        conteo_emojis = Counter(RE_EMOJI.findall(mensaje))
+
+        if autor not in palabras_autor:
+            palabras_autor[autor] = _nuevo_contador(exacto, capacidad_autor)
+            emojis_autor[autor] = _nuevo_contador(exacto, capacidad_autor)
+        if conteo_palabras:
+            palabras.actualizar(conteo_palabras)
+            palabras_autor[autor].actualizar(conteo_palabras)
+        if conteo_emojis:
+            emojis.actualizar(conteo_emojis)
+            emojis_autor[autor].actualizar(conteo_emojis)
+            emojis_por_autor[autor] += sum(conteo_emojis.values())
+
+    return {
+        'palabras': palabras,
+        'emojis': emojis,
+        'palabras_autor': palabras_autor,
+        'emojis_autor': emojis_autor,
+        'emojis_por_autor': emojis_por_autor,
+    }
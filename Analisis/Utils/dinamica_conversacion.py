@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Minutos sin mensajes a partir de los cuales empieza una conversación nueva.
+UMBRAL_CONVERSACION_MIN = 60
+# Una respuesta se considera "rápida" si llega antes de estos minutos.
+RESPUESTA_RAPIDA_MIN = 5
+
+
+def calcular_dinamica_conversacion(df_chat, umbral_conversacion_min=UMBRAL_CONVERSACION_MIN):
+    """
+    Calcula la dinámica de la conversación a partir del orden y la hora de los mensajes:
+    latencias de respuesta entre autores, conversaciones (separadas por inactividad),
+    longitud de los turnos y quién inicia cada conversación.
+
+    Todo se calcula con operaciones vectorizadas (diff/shift/bincount) sobre los arrays
+    ordenados por tiempo, sin bucles de Python por mensaje.
+
+    Devuelve un dict con:
+      - 'pares': una fila por (Autor, Responde a) con número de respuestas y latencias.
+      - 'autores': una fila por autor con turnos, mensajes por turno y conversaciones iniciadas.
+      - 'conversaciones': número total de conversaciones.
+    """
+    columnas_pares = ['Autor', 'Responde a', 'Respuestas', 'Latencia Mediana (min)',
+                      'Latencia Media (min)', 'Respuestas Rápidas (%)']
+    columnas_autores = ['Mensajes', 'Turnos', 'Mensajes por Turno', 'Conversaciones Iniciadas',
+                        'Latencia Mediana (min)']
+    if df_chat.empty:
+        return {
+            'pares': pd.DataFrame(columns=columnas_pares),
+            'autores': pd.DataFrame(columns=columnas_autores),
+            'conversaciones': 0,
+        }
+
+    # --- Arrays ordenados por tiempo ---
+    tiempos_ns = pd.to_datetime(df_chat['Timestamp']).to_numpy(dtype='datetime64[ns]')
+    orden = np.argsort(tiempos_ns, kind='stable')
+    segundos = tiempos_ns[orden].view('int64') // 10**9
+    codigos, nombres = pd.factorize(df_chat['Autor'].to_numpy()[orden])
+    n, k = len(codigos), len(nombres)
+
+    # Segundos desde el mensaje anterior (0 para el primero)
+    delta = np.diff(segundos, prepend=segundos[0])
+
+    nueva_conversacion = np.ones(n, dtype=bool)
+    nueva_conversacion[1:] = delta[1:] > umbral_conversacion_min * 60
+
+    cambio_autor = np.ones(n, dtype=bool)
+    cambio_autor[1:] = codigos[1:] != codigos[:-1]
+
+    # Un turno es una racha de mensajes seguidos del mismo autor dentro de una conversación
+    inicio_turno = nueva_conversacion | cambio_autor
+
+    # --- Respuestas: cambio de autor dentro de la misma conversación ---
+    idx_respuesta = np.flatnonzero(cambio_autor & ~nueva_conversacion)
+    respuestas = pd.DataFrame({
+        'de': codigos[idx_respuesta],
+        'a': codigos[idx_respuesta - 1],
+        'latencia': delta[idx_respuesta] / 60.0,
+    })
+    respuestas['rapida'] = respuestas['latencia'] <= RESPUESTA_RAPIDA_MIN
+
+    pares = respuestas.groupby(['de', 'a']).agg(
+        Respuestas=('latencia', 'size'),
+        mediana=('latencia', 'median'),
+        media=('latencia', 'mean'),
+        rapidas=('rapida', 'mean'),
+    ).reset_index()
+    pares.insert(0, 'Autor', nombres[pares['de'].to_numpy()])
+    pares.insert(1, 'Responde a', nombres[pares['a'].to_numpy()])
+    pares = pares.drop(columns=['de', 'a']).rename(columns={
+        'mediana': 'Latencia Mediana (min)',
+        'media': 'Latencia Media (min)',
+        'rapidas': 'Respuestas Rápidas (%)',
+    })
+    pares['Respuestas Rápidas (%)'] *= 100
+    pares = pares.sort_values('Respuestas', ascending=False).reset_index(drop=True)
+
+    # --- Turnos y conversaciones por autor ---
+    mensajes = np.bincount(codigos, minlength=k)
+    turnos = np.bincount(codigos[inicio_turno], minlength=k)
+    iniciadas = np.bincount(codigos[nueva_conversacion], minlength=k)
+    latencia_autor = respuestas.groupby('de')['latencia'].median().reindex(range(k))
+
+    autores = pd.DataFrame({
+        'Mensajes': mensajes,
+        'Turnos': turnos,
+        'Mensajes por Turno': mensajes / np.maximum(turnos, 1),
+        'Conversaciones Iniciadas': iniciadas,
+        'Latencia Mediana (min)': latencia_autor.to_numpy(),
+    }, index=pd.Index(nombres, name='Autor')).sort_values('Mensajes', ascending=False)
+
+    return {
+        'pares': pares,
+        'autores': autores,
+        'conversaciones': int(nueva_conversacion.sum()),
+    }
+
+
+def calcular_reciprocidad(pares):
+    """
+    Puntaje 0-100 de reciprocidad a partir de la tabla de pares: para cada pareja de
+    autores compara cuántas veces responde cada uno al otro (1 = se responden por igual),
+    ponderado por el total de respuestas de la pareja.
+    """
+    if pares.empty:
+        return 0.0
+
+    ida = pares.set_index(['Autor', 'Responde a'])['Respuestas']
+    vuelta = ida.copy()
+    vuelta.index = vuelta.index.swaplevel()
+    conjunto = pd.concat([ida.rename('ida'), vuelta.rename('vuelta')], axis=1).fillna(0)
+
+    total = conjunto['ida'] + conjunto['vuelta']
+    equilibrio = np.minimum(conjunto['ida'], conjunto['vuelta']) / np.maximum(conjunto['ida'], conjunto['vuelta'])
+    return float((equilibrio * total).sum() / total.sum() * 100) if total.sum() > 0 else 0.0
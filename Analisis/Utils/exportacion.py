@@ -0,0 +1,76 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Analisis.Utils.resultados_modelo import huella_chat
+
+# Clave de los metadatos del esquema donde se guarda la información de la app.
+CLAVE_METADATOS = b'whatsentics'
+VERSION_FORMATO = 1
+
+
+def exportar_parquet(df_chat, resultados):
+    """
+    Escribe el chat limpio junto con las etiquetas y probabilidades de cada modelo
+    en un único archivo Parquet (devuelto como bytes).
+
+    - `resultados`: {tarea: {'clases': [...], 'probas': matriz float16}}
+    - Autor y etiquetas se guardan como columnas de diccionario; las probabilidades en float16.
+    """
+    columnas = {
+        'Timestamp': pa.array(pd.to_datetime(df_chat['Timestamp']).to_numpy(dtype='datetime64[ns]')),
+        'Autor': pa.array(df_chat['Autor'].to_numpy(dtype=object), type=pa.string()).dictionary_encode(),
+        'Mensaje': pa.array(df_chat['Mensaje'].to_numpy(dtype=object), type=pa.string()),
+    }
+    clases = {}
+    for tarea, resultado in resultados.items():
+        probas = np.asarray(resultado['probas'], dtype=np.float16)
+        clases[tarea] = list(resultado['clases'])
+        etiquetas = np.asarray(clases[tarea], dtype=object)[probas.argmax(axis=1)] if probas.size else []
+        columnas[f'{tarea}_etiqueta'] = pa.array(etiquetas, type=pa.string()).dictionary_encode()
+        for j, clase in enumerate(clases[tarea]):
+            columnas[f'{tarea}_p_{clase}'] = pa.array(np.ascontiguousarray(probas[:, j]), type=pa.float16())
+
+    metadatos = {
+        'version': VERSION_FORMATO,
+        'huella': huella_chat(df_chat),
+        'clases': clases,
+        'mensajes_sistema': df_chat.attrs.get('mensajes_sistema', {}),
+    }
+    tabla = pa.table(columnas).replace_schema_metadata({CLAVE_METADATOS: json.dumps(metadatos).encode('utf-8')})
+
+    buffer = io.BytesIO()
+    pq.write_table(tabla, buffer, compression='zstd')
+    return buffer.getvalue()
+
+
+def cargar_parquet(contenido_bytes):
+    """
+    Lee un archivo generado por `exportar_parquet`.
+    Devuelve (df_chat, resultados) listos para usar sin volver a parsear ni a ejecutar los modelos.
+    Lanza ValueError si el archivo no fue exportado por esta aplicación.
+    """
+    tabla = pq.read_table(io.BytesIO(contenido_bytes))
+    metadatos_esquema = tabla.schema.metadata or {}
+    if CLAVE_METADATOS not in metadatos_esquema:
+        raise ValueError("El archivo Parquet no fue exportado por el Analizador de Chats.")
+    metadatos = json.loads(metadatos_esquema[CLAVE_METADATOS])
+
+    df_chat = tabla.select(['Timestamp', 'Autor', 'Mensaje']).to_pandas()
+    # El resto de la app trabaja con autores como texto (no categóricos)
+    df_chat['Autor'] = df_chat['Autor'].astype(str)
+    df_chat.attrs['mensajes_sistema'] = metadatos.get('mensajes_sistema', {})
+    df_chat.attrs['huella'] = huella_chat(df_chat)
+
+    resultados = {}
+    for tarea, clases in metadatos.get('clases', {}).items():
+        probas = np.column_stack([
+            tabla.column(f'{tarea}_p_{clase}').to_numpy() for clase in clases
+        ]).astype(np.float16) if clases and tabla.num_rows else np.zeros((tabla.num_rows, len(clases)), dtype=np.float16)
+        resultados[tarea] = {'clases': clases, 'probas': probas}
+
+    return df_chat, resultados
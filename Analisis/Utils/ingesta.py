@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+
+import streamlit as st
+
+from Analisis.Utils.aux_opciones import leer_chat
+from Utils.memoria_sesiones import guardar_dato_sesion
+
+# --- Ingesta del Chat en Segundo Plano ---
+# Leer un chat grande (descomprimir, decodificar, parsear, convertir fechas y
+# limpiar) puede tardar. Se hace en un hilo aparte y el trabajo se guarda en
+# st.session_state, así la página sigue respondiendo, muestra el avance de cada
+# etapa y el trabajo sobrevive a los reruns que provoque la interfaz.
+
+EN_CURSO, LISTO, ERROR, CANCELADO = 'en_curso', 'listo', 'error', 'cancelado'
+
+# Etapas en orden: (clave, etiqueta)
+ETAPAS_INGESTA = [
+    ('descomprimir', "Descomprimiendo"),
+    ('decodificar', "Decodificando"),
+    ('parsear', "Parseando líneas"),
+    ('fechas', "Convirtiendo fechas"),
+    ('limpieza', "Limpieza final"),
+]
+
+
+class IngestaCancelada(Exception):
+    """La lanza el progreso de un trabajo cancelado para abortar la lectura."""
+
+
+class TrabajoIngesta:
+    """Lectura de un archivo de chat en un hilo de fondo, con avance por etapas y cancelación."""
+
+    def __init__(self, nombre, contenido):
+        self.nombre = nombre
+        self.clave = clave_ingesta(nombre, contenido)
+        self.estado = EN_CURSO
+        self.etapa = None
+        self.contadores = {}
+        self.df = None
+        self.error = None
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self._cancelar = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar, args=(contenido,), name=f"ingesta-{nombre}", daemon=True)
+        self._hilo.start()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def _progreso(self, etapa, **contadores):
+        if self._cancelar.is_set():
+            raise IngestaCancelada()
+        self.etapa = etapa
+        self.contadores = {**self.contadores, **contadores}
+
+    def _ejecutar(self, contenido):
+        try:
+            self.df = leer_chat(self.nombre, contenido, progreso=self._progreso)
+            estado = LISTO
+        except IngestaCancelada:
+            estado = CANCELADO
+        except ValueError as e:
+            self.error, estado = str(e), ERROR
+        except Exception as e:
+            self.error, estado = f"Error inesperado al procesar el chat: {e}", ERROR
+        self.duracion = time.perf_counter() - self.inicio
+        self.estado = estado  # lo último: el hilo del script lee el estado sin lock
+
+
+def clave_ingesta(nombre, contenido):
+    """Identifica un archivo subido (el mismo archivo no se vuelve a procesar en cada rerun)."""
+    return nombre, hashlib.sha1(contenido).hexdigest()
+
+
+def iniciar_ingesta(uploaded_file):
+    """Lanza la lectura del archivo en segundo plano, salvo que ya se esté leyendo o se haya leído."""
+    contenido = uploaded_file.getvalue()
+    trabajo = st.session_state.get('ingesta')
+    if trabajo is None or trabajo.clave != clave_ingesta(uploaded_file.name, contenido):
+        if trabajo is not None:
+            trabajo.cancelar()
+        st.session_state.ingesta = TrabajoIngesta(uploaded_file.name, contenido)
+    return st.session_state.ingesta
+
+
+def recoger_ingesta():
+    """
+    Si la ingesta de la sesión terminó bien, guarda el chat en la sesión y lo devuelve
+    (el trabajo se olvida). Si no, devuelve None.
+    """
+    trabajo = st.session_state.get('ingesta')
+    if trabajo is None or trabajo.estado != LISTO:
+        return None
+
+    df_chat = trabajo.df
+    guardar_dato_sesion('df_chat', df_chat)
+    st.session_state.file_name = trabajo.nombre
+    # Resumen de la limpieza para mostrarlo junto al chat cargado
+    st.session_state.mensajes_sistema = df_chat.attrs.get('mensajes_sistema', {})
+    del st.session_state['ingesta']
+    return df_chat
+
+
+def descartar_ingesta():
+    """Cancela y olvida la ingesta de la sesión, si la hay."""
+    trabajo = st.session_state.pop('ingesta', None)
+    if trabajo is not None:
+        trabajo.cancelar()
+
+
+def _describir_etapa(etapa, contadores):
+    if etapa == 'decodificar':
+        return f"{contadores.get('bytes_decodificados', 0) / 2**20:.1f} / {contadores.get('bytes_totales', 0) / 2**20:.1f} MB"
+    if etapa == 'parsear':
+        return f"{contadores.get('lineas_parseadas', 0):,} / {contadores.get('lineas_totales', 0):,} líneas"
+    if etapa == 'fechas':
+        return f"{contadores.get('fechas_convertidas', 0):,} / {contadores.get('mensajes_totales', 0):,} mensajes"
+    if etapa == 'limpieza':
+        return f"{contadores.get('mensajes_conservados', 0):,} mensajes conservados"
+    return ""
+
+
+def mostrar_ingesta(trabajo):
+    """
+    Muestra el avance de la ingesta con st.status. Mientras está en curso se refresca
+    sola cada medio segundo (como fragmento) y, al terminar, vuelve a ejecutar la app
+    para que el chat cargado aparezca.
+    """
+    def contenido():
+        estado = trabajo.estado
+        if estado == EN_CURSO:
+            etiqueta, tipo = f"Procesando {trabajo.nombre}...", "running"
+        elif estado == LISTO:
+            etiqueta, tipo = f"Chat procesado en {trabajo.duracion:.1f} s", "complete"
+        elif estado == CANCELADO:
+            etiqueta, tipo = "Carga cancelada", "error"
+        else:
+            etiqueta, tipo = "No se pudo procesar el chat", "error"
+
+        with st.status(etiqueta, state=tipo, expanded=estado == EN_CURSO):
+            claves = [clave for clave, _ in ETAPAS_INGESTA]
+            actual = claves.index(trabajo.etapa) if trabajo.etapa in claves else -1
+            for i, (clave, nombre_etapa) in enumerate(ETAPAS_INGESTA):
+                if clave == 'descomprimir' and not trabajo.nombre.endswith('.zip'):
+                    continue  # solo los .zip pasan por esta etapa
+                if i < actual or (i == actual and estado == LISTO):
+                    icono = "✅"
+                elif i == actual and estado == EN_CURSO:
+                    icono = "⏳"
+                else:
+                    icono = "▫️"
+                detalle = _describir_etapa(clave, trabajo.contadores) if i <= actual else ""
+                st.write(f"{icono} {nombre_etapa}" + (f": {detalle}" if detalle else ""))
+
+        if estado == EN_CURSO:
+            if st.button("Cancelar carga", key='cancelar_ingesta'):
+                trabajo.cancelar()
+        elif estado == ERROR:
+            st.error(trabajo.error)
+        elif estado == CANCELADO:
+            if st.button("Volver a procesar", key='reintentar_ingesta'):
+                del st.session_state['ingesta']
+                st.rerun()
+
+        if estado != EN_CURSO and en_curso:
+            st.rerun()  # terminó: se redibuja la app (carga el chat o deja de refrescar)
+
+    en_curso = trabajo.estado == EN_CURSO
+    st.fragment(contenido, run_every=0.5 if en_curso else None)()
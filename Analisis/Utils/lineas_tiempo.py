@@ -0,0 +1,194 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from Analisis.Utils.resultados_modelo import (
+    TAREAS, CLASES_POR_TAREA, huella_chat, calcular_probabilidades, guardar_probabilidades, codigos_etiquetas
+)
+from Analisis.Utils.precalculo import obtener_planificador
+from Utils.memoria_sesiones import guardar_dato_sesion, obtener_dato_sesion, eliminar_datos_sesion, id_sesion_actual
+
+# --- Líneas de Tiempo de Emociones y Sentimientos ---
+# Se cuentan los mensajes por día, autor y etiqueta (el código de la clase más
+# probable, guardado con las probabilidades del chat). Las vistas por semana o mes,
+# por autor y con ventana móvil se sacan de ese conteo diario sin volver a
+# ejecutar los modelos, así que también son rápidas en chats de varios años.
+# Es el precálculo que ejecuta los modelos: puntúa el chat por lotes y guarda las
+# probabilidades que después reutilizan las opciones de emociones y amistad.
+
+# Periodos de las líneas de tiempo: etiqueta -> frecuencia de pandas
+FRECUENCIAS = {'Día': 'D', 'Semana': 'W', 'Mes': 'MS'}
+# Si el chat aún no tiene probabilidades, se puntúa en lotes de este tamaño y
+# cada lote actualiza solo los días en los que caen sus mensajes
+TAM_LOTE_LINEA_TIEMPO = int(os.environ.get("WHATSENTICS_TAM_LOTE_LINEA_TIEMPO", "5000"))
+# Clave de la sesión donde se publica el avance por lotes (para mostrarlo desde otro hilo)
+CLAVE_AVANCE = 'avance_lineas_tiempo'
+
+
+class AgregadoTemporal:
+    """
+    Conteo de mensajes por (día, autor) y clase, que se actualiza por lotes:
+    añadir un lote solo suma en los días y autores que aparecen en él.
+    """
+
+    def __init__(self, clases):
+        self.clases = list(clases)
+        self.mensajes = 0
+        self.conteos = pd.DataFrame(
+            columns=range(len(self.clases)), dtype='int64',
+            index=pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=object)], names=['Dia', 'Autor'])
+        )
+
+    def anadir(self, timestamps, autores, codigos):
+        """Suma un lote de mensajes (timestamps, autores y códigos de etiqueta alineados)."""
+        if len(codigos) == 0:
+            return
+        lote = pd.DataFrame({
+            'Dia': pd.DatetimeIndex(timestamps).normalize(),
+            'Autor': np.asarray(autores, dtype=object),
+            'codigo': np.asarray(codigos),
+        })
+        parcial = (lote.groupby(['Dia', 'Autor', 'codigo']).size()
+                   .unstack('codigo', fill_value=0)
+                   .reindex(columns=range(len(self.clases)), fill_value=0))
+
+        existentes = parcial.index.isin(self.conteos.index)
+        if existentes.any():
+            self.conteos.loc[parcial.index[existentes]] += parcial[existentes]
+        if not existentes.all():
+            self.conteos = pd.concat([self.conteos, parcial[~existentes]])
+        self.mensajes += len(lote)
+
+    @property
+    def nbytes(self):
+        """Bytes del conteo diario (para el registro de memoria de la sesión)."""
+        return int(self.conteos.memory_usage(index=True, deep=True).sum())
+
+    def autores(self):
+        return sorted(self.conteos.index.get_level_values('Autor').unique())
+
+    def serie(self, frecuencia='D', autor=None, ventana=1, porcentaje=True):
+        """
+        Mensajes por periodo y clase (columnas con el nombre de la clase). `ventana`
+        suma los mensajes de los últimos N periodos (suma móvil). Con `porcentaje`,
+        cada punto muestra el reparto entre clases en % de esa suma, así que los
+        periodos con más mensajes pesan más.
+        """
+        conteos = self.conteos
+        if autor is not None:
+            conteos = conteos[conteos.index.get_level_values('Autor') == autor]
+        if conteos.empty:
+            return pd.DataFrame(columns=self.clases, dtype=float)
+
+        por_periodo = conteos.groupby(level='Dia').sum().sort_index().resample(frecuencia).sum()
+        if ventana > 1:
+            por_periodo = por_periodo.rolling(ventana, min_periods=1).sum()
+        por_periodo.columns = self.clases
+        por_periodo.index.name = 'Fecha'
+
+        if porcentaje:
+            totales = por_periodo.sum(axis=1).replace(0, np.nan)
+            por_periodo = por_periodo.div(totales, axis=0) * 100
+        return por_periodo
+
+
+def _ordenar_clases(resultado, clases):
+    """Reordena las columnas de probabilidades de `resultado` según `clases`."""
+    if list(resultado['clases']) == list(clases):
+        return resultado['probas']
+    columnas = [list(resultado['clases']).index(c) for c in clases]
+    return resultado['probas'][:, columnas]
+
+
+def agregar_tarea(df_chat, tarea, id_sesion=None, al_lote=None):
+    """
+    Agregado temporal de las etiquetas de `tarea`. Usa las probabilidades guardadas
+    en la sesión; si no hay, puntúa el chat por lotes (cada lote actualiza el
+    agregado y llama a al_lote(tarea, agregado, hechos, total)) y las guarda.
+
+    Los lotes ya puntuados se guardan en la sesión a medida que se calculan: si la
+    ejecución se interrumpe (p. ej. un rerun en el hilo del script), la siguiente
+    continúa desde el primer mensaje sin puntuar.
+    """
+    huella = huella_chat(df_chat)
+    guardado = obtener_dato_sesion(f'probas_{tarea}', id_sesion=id_sesion)
+    if guardado is not None and guardado['huella'] == huella:
+        agregado = AgregadoTemporal(guardado['clases'])
+        agregado.anadir(df_chat['Timestamp'], df_chat['Autor'], codigos_etiquetas(guardado))
+        return agregado
+
+    clave_parcial = f'parcial_{tarea}'
+    parcial = obtener_dato_sesion(clave_parcial, id_sesion=id_sesion)
+    if parcial is not None and parcial['huella'] == huella:
+        agregado = AgregadoTemporal(parcial['clases'])
+        partes, resueltos, hechos = parcial['partes'], parcial['resueltos_por_reglas'], parcial['hechos']
+        if hechos:
+            agregado.anadir(df_chat['Timestamp'].iloc[:hechos], df_chat['Autor'].iloc[:hechos],
+                            np.concatenate(partes).argmax(axis=1).astype(np.int8))
+    else:
+        agregado = AgregadoTemporal(CLASES_POR_TAREA[tarea])
+        partes, resueltos, hechos = [], 0, 0
+
+    for inicio in range(hechos, len(df_chat), TAM_LOTE_LINEA_TIEMPO):
+        lote = df_chat.iloc[inicio:inicio + TAM_LOTE_LINEA_TIEMPO]
+        resultado = calcular_probabilidades(lote['Mensaje'], tarea)
+        if not partes and list(resultado['clases']) != agregado.clases:
+            agregado = AgregadoTemporal(resultado['clases'])  # el orden de clases del modelo manda
+        probas = _ordenar_clases(resultado, agregado.clases)
+        agregado.anadir(lote['Timestamp'], lote['Autor'], probas.argmax(axis=1).astype(np.int8))
+        partes.append(probas)
+        resueltos += resultado['resueltos_por_reglas']
+        hechos = inicio + len(lote)
+        guardar_dato_sesion(clave_parcial, {
+            'huella': huella, 'clases': agregado.clases, 'partes': partes,
+            'resueltos_por_reglas': resueltos, 'hechos': hechos,
+        }, id_sesion=id_sesion)
+        if al_lote is not None:
+            al_lote(tarea, agregado, hechos, len(df_chat))
+
+    if partes:
+        guardar_probabilidades(df_chat, tarea, {
+            'clases': agregado.clases,
+            'probas': np.concatenate(partes),
+            'resueltos_por_reglas': resueltos,
+        }, id_sesion=id_sesion)
+    eliminar_datos_sesion(clave_parcial, id_sesion=id_sesion)
+    return agregado
+
+
+def calcular_lineas_tiempo(df_chat, id_sesion=None, al_lote=None):
+    """
+    {tarea: AgregadoTemporal} de emociones y sentimientos (se precalcula en segundo
+    plano al cargar el chat). Tras cada lote publica en la sesión el avance y la
+    serie mensual parcial (ver leer_avance), además de llamar a `al_lote`.
+    """
+    id_sesion = id_sesion or id_sesion_actual()
+    huella = huella_chat(df_chat)
+
+    def publicar(tarea, agregado, hechos, total):
+        guardar_dato_sesion(CLAVE_AVANCE, {
+            'huella': huella, 'tarea': tarea, 'serie': agregado.serie('MS'), 'hechos': hechos, 'total': total,
+        }, id_sesion=id_sesion)
+        if al_lote is not None:
+            al_lote(tarea, agregado, hechos, total)
+
+    agregados = {tarea: agregar_tarea(df_chat, tarea, id_sesion=id_sesion, al_lote=publicar) for tarea in TAREAS}
+    eliminar_datos_sesion(CLAVE_AVANCE, id_sesion=id_sesion)
+    return agregados
+
+
+def leer_avance(df_chat):
+    """Último avance publicado por calcular_lineas_tiempo para este chat (o None)."""
+    avance = obtener_dato_sesion(CLAVE_AVANCE)
+    if avance is None or avance['huella'] != huella_chat(df_chat):
+        return None
+    return avance
+
+
+def esperar_probabilidades(df_chat, id_sesion=None):
+    """
+    Espera (o ejecuta ya) el precálculo de las líneas de tiempo, que guarda las
+    probabilidades de los dos modelos: así emociones y amistad no repiten la inferencia.
+    """
+    obtener_planificador().esperar(id_sesion or id_sesion_actual(), 'lineas_tiempo', huella_chat(df_chat))
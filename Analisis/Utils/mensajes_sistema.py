@@ -0,0 +1,133 @@
+import re
+import unicodedata
+
+# --- Mensajes de Sistema de WhatsApp ---
+# Frases que WhatsApp escribe en lugar (o además) de un mensaje real, agrupadas por
+# categoría. Cada categoría incluye las variantes en español, inglés y portugués.
+# Las de CATEGORIAS_MARCADOR sustituyen al texto de un mensaje con autor y tienen que
+# ser el mensaje completo; el resto son avisos sin autor (líneas que empiezan con fecha).
+
+FRASES_SISTEMA = {
+    'multimedia': [
+        # es
+        "<multimedia omitido>", "multimedia omitido", "imagen omitida", "video omitido", "gif omitido",
+        "sticker omitido", "audio omitido", "documento omitido",
+        # en
+        "<media omitted>", "image omitted", "video omitted", "gif omitted", "sticker omitted",
+        "audio omitted", "document omitted",
+        # pt
+        "<mídia oculta>", "<arquivo de mídia oculto>", "imagem ocultada", "vídeo omitido", "áudio ocultado",
+        "figurinha omitida",
+    ],
+    'eliminado': [
+        "se eliminó este mensaje", "eliminaste este mensaje",
+        "this message was deleted", "you deleted this message",
+        "esta mensagem foi apagada", "você apagou esta mensagem", "mensagem apagada",
+    ],
+    'llamada': [
+        "llamada perdida", "videollamada perdida", "llamada de voz perdida",
+        "missed voice call", "missed video call",
+        "chamada de voz perdida", "chamada de vídeo perdida",
+    ],
+    'ubicacion': [
+        "ubicación:", "location:", "localização:",
+    ],
+    'grupo': [
+        "creó el grupo", "añadió a", "te añadió", "saliste del grupo", "cambió el ícono de este grupo",
+        "cambió el asunto",
+        "created group", "added you", "you left", "changed this group's icon", "changed the subject",
+        "criou o grupo", "adicionou você", "você saiu", "mudou a imagem deste grupo", "mudou o assunto",
+    ],
+    'seguridad': [
+        "cambió tu código de seguridad", "tu código de seguridad con",
+        "your security code with",
+        "seu código de segurança com",
+    ],
+    'cifrado': [
+        "están cifrados de extremo a extremo",
+        "are end-to-end encrypted",
+        "protegidas com a criptografia de ponta a ponta",
+    ],
+}
+
+NOMBRES_CATEGORIAS = {
+    'multimedia': "multimedia omitida",
+    'eliminado': "mensajes eliminados",
+    'llamada': "llamadas perdidas",
+    'ubicacion': "ubicaciones",
+    'grupo': "avisos del grupo",
+    'seguridad': "avisos de seguridad",
+    'cifrado': "avisos de cifrado",
+    'otros': "otros avisos del sistema",
+}
+
+# Categorías que ocupan el lugar del texto de un mensaje con autor
+CATEGORIAS_MARCADOR = ('multimedia', 'eliminado', 'llamada', 'ubicacion')
+# Lo que puede seguir a la frase en un marcador (por defecto, solo un punto final)
+SUFIJOS_MARCADOR = {'ubicacion': r'\s*https?://\S+'}
+
+# Línea que empieza con el prefijo completo de la exportación ("<fecha>, <hora> - " o
+# "[<fecha>, <hora>]"): si no tiene "Autor:" es un aviso del sistema. Una línea que solo
+# empieza con una fecha ("01/02/24 a las 5...") es la continuación de un mensaje.
+_FECHA_HORA = r'\d{1,2}/\d{1,2}/\d{2,4},?\s*\d{1,2}:\d{2}(?::\d{2})?(?:\s*[ap]\.?\s*m\.?)?'
+RE_INICIO_CON_FECHA = re.compile(rf'^(?:{_FECHA_HORA}\s*-\s|\[{_FECHA_HORA}\])', re.IGNORECASE)
+
+
+def _a_patron(frase):
+    """
+    Escapa la frase y hace que cada letra con tilde acepte también su forma
+    descompuesta (letra + tilde combinante), que aparece en algunos exportes.
+    """
+    partes = []
+    for c in frase:
+        descompuesto = unicodedata.normalize('NFD', c)
+        if len(descompuesto) > 1:
+            partes.append(f"(?:{c}|{re.escape(descompuesto)})")
+        else:
+            partes.append(re.escape(c))
+    return ''.join(partes)
+
+
+def _patron_categorias(categorias, sufijos=None):
+    """Un único patrón con un grupo con nombre por categoría: una sola pasada por mensaje."""
+    sufijos = sufijos or {}
+    return re.compile(
+        '|'.join(
+            f"(?P<{categoria}>(?:{'|'.join(_a_patron(f) for f in FRASES_SISTEMA[categoria])}){sufijos.get(categoria, '')})"
+            for categoria in categorias
+        ),
+        re.IGNORECASE,
+    )
+
+
+# Marcadores: el texto completo de un mensaje con autor (con fullmatch, nunca buscando dentro)
+RE_MARCADOR = _patron_categorias(
+    CATEGORIAS_MARCADOR, {c: SUFIJOS_MARCADOR.get(c, r'\.?') for c in CATEGORIAS_MARCADOR}
+)
+# Avisos: se buscan solo en líneas sin autor, que nunca son texto escrito por alguien
+RE_AVISO = _patron_categorias(FRASES_SISTEMA)
+# Avisos del grupo que pueden llevar ':' y parsearse como "Autor: mensaje"
+# (p. ej. 'Ana cambió el asunto de "x" a "y: z"'); se buscan en la parte del autor
+RE_AVISO_EN_AUTOR = _patron_categorias(
+    [c for c in FRASES_SISTEMA if c not in CATEGORIAS_MARCADOR]
+)
+
+
+def clasificar_mensaje_sistema(texto, autor=None):
+    """
+    Devuelve la categoría de sistema de un mensaje con autor, o None si es un mensaje
+    normal. El texto tiene que ser entero un marcador ("<Multimedia omitido>",
+    "Se eliminó este mensaje."...): una frase parecida dentro de un mensaje real no cuenta.
+    """
+    if autor:
+        match = RE_AVISO_EN_AUTOR.search(autor)
+        if match:
+            return match.lastgroup
+    match = RE_MARCADOR.fullmatch(texto.strip())
+    return match.lastgroup if match else None
+
+
+def clasificar_aviso_sistema(linea):
+    """Devuelve la categoría de una línea de aviso sin autor (p. ej. "Ana creó el grupo"), o None."""
+    match = RE_AVISO.search(linea)
+    return match.lastgroup if match else None
@@ -0,0 +1,216 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from Analisis.Utils.mensajes_sistema import clasificar_mensaje_sistema, clasificar_aviso_sistema, RE_INICIO_CON_FECHA
+
+# --- Parser de Chats de WhatsApp (sin Streamlit) ---
+# Este módulo no depende de Streamlit para poder ejecutarse en procesos hijos.
+# El mismo parseo por bloques se usa en el modo secuencial y en el paralelo,
+# así que ambos devuelven exactamente el mismo resultado.
+
+# A partir de este tamaño (texto decodificado) se parsea en paralelo por trozos
+UMBRAL_PARSEO_PARALELO_BYTES = int(os.environ.get("WHATSENTICS_UMBRAL_PARSEO_PARALELO_MB", "32")) * 1024 * 1024
+# Procesos del pool de parseo (0 = uno por núcleo)
+PROCESOS_PARSEO = int(os.environ.get("WHATSENTICS_PROCESOS_PARSEO", "0")) or os.cpu_count() or 1
+# Líneas iniciales sobre las que se detecta el formato del timestamp
+LINEAS_MUESTRA = 5000
+# Mínimo de mensajes para dar por válido un formato
+MIN_MENSAJES_PATRON = 5
+# En el modo secuencial con progreso, el texto se parsea en trozos de este tamaño
+TAM_TROZO_PROGRESO = 4 * 1024 * 1024
+
+# ---- Limpieza inicial ----
+RE_CONTROL = re.compile(r'[\x00-\x1f\x7f-\x9f\u200e\u200f\ufeff\u202f\xa0]+')
+
+# ---- 4 posibles formatos de timestamp ----
+PATRONES_TIMESTAMP = [
+    # 1️⃣ "21/9/25, 06:50 - Autor: Mensaje"
+    re.compile(r'^(\d{1,2}/\d{1,2}/\d{2,4},\s*\d{1,2}:\d{2}(?:\s*(?:[ap]\.?m\.?))?)\s*-\s*([^:]+):\s*(.*)', re.IGNORECASE),
+    # 2️⃣ "21/9/25 06:50 - Autor: Mensaje" (sin coma)
+    re.compile(r'^(\d{1,2}/\d{1,2}/\d{2,4}\s+\d{1,2}:\d{2}(?:\s*(?:[ap]\.?m\.?))?)\s*-\s*([^:]+):\s*(.*)', re.IGNORECASE),
+    # 3️⃣ "25/4/2025, 1:35 p. m. - Autor: Mensaje" (con puntos y espacios)
+    re.compile(r'^(\d{1,2}/\d{1,2}/\d{2,4},\s*\d{1,2}:\d{2}\s*[ap]\.\s*m\.)\s*-\s*([^:]+):\s*(.*)', re.IGNORECASE),
+    # 4️⃣ Formato alternativo iOS (por si acaso)
+    re.compile(r'^\[(\d{1,2}/\d{1,2}/\d{2,4},?\s*\d{1,2}:\d{2}(?:\s*(?:[ap]\.?m\.?))?)\]\s*([^:]+):\s*(.*)', re.IGNORECASE),
+]
+
+
+def limpieza_estricta_texto(texto):
+    """
+    Limpia texto: minúsculas, sin tildes (opcional), conserva emojis y caracteres Unicode visibles.
+    """
+    if not isinstance(texto, str):
+        return ""
+    texto = texto.lower()
+    # Normaliza tildes (mantiene emojis y otros símbolos Unicode intactos)
+    texto = unicodedata.normalize('NFD', texto)
+    texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn' or not c.isascii())
+    # Limpia caracteres de control, pero mantiene emojis, signos, puntuación normal y emojis Unicode
+    texto = re.sub(r'[\x00-\x1f\x7f-\x9f]+', '', texto)  # elimina caracteres invisibles
+    texto = re.sub(r'\s{2,}', ' ', texto).strip()  # normaliza espacios múltiples
+
+    return texto
+
+
+def parsear_lineas(lineas, patron):
+    """
+    Parsea una secuencia de líneas con el formato `patron` en una sola pasada.
+
+    Los mensajes de sistema (multimedia omitida, eliminados, avisos del grupo...)
+    se descartan aquí mismo, antes de convertirse en filas.
+    Devuelve (columnas {'Timestamp_str', 'Autor', 'Mensaje'} sin limpiar, conteo de sistema).
+    """
+    timestamps, autores, mensajes = [], [], []
+    conteo_sistema = Counter()
+    mensaje_buffer = []
+    timestamp_actual = autor_actual = None
+
+    def cerrar_mensaje():
+        if autor_actual and timestamp_actual and mensaje_buffer:
+            mensaje = " ".join(mensaje_buffer)
+            categoria = clasificar_mensaje_sistema(mensaje, autor_actual)
+            if categoria:
+                conteo_sistema[categoria] += 1
+            else:
+                timestamps.append(timestamp_actual)
+                autores.append(autor_actual)
+                mensajes.append(mensaje)
+
+    for linea in lineas:
+        linea = RE_CONTROL.sub('', linea).strip()
+        if not linea:
+            continue
+
+        match = patron.match(linea)
+        if match:
+            cerrar_mensaje()
+            timestamp_actual = match.group(1).strip()
+            autor_actual = match.group(2).strip()
+            mensaje_buffer = [match.group(3).strip()] if match.group(3).strip() else []
+        elif RE_INICIO_CON_FECHA.match(linea):
+            # Línea con fecha pero sin "Autor:" -> aviso del sistema (ej: "Juan creó el grupo")
+            if timestamp_actual:
+                conteo_sistema[clasificar_aviso_sistema(linea) or 'otros'] += 1
+        elif timestamp_actual and autor_actual:
+            mensaje_buffer.append(linea)
+
+    cerrar_mensaje()
+    return {'Timestamp_str': timestamps, 'Autor': autores, 'Mensaje': mensajes}, conteo_sistema
+
+
+def _parsear_bloque(texto, indice_patron):
+    """
+    Trabajo de un proceso: parsea un trozo del chat y limpia autores y mensajes.
+    Recibe el índice del patrón (los patrones compilados viven en este módulo).
+    """
+    columnas, conteo_sistema = parsear_lineas(texto.splitlines(), PATRONES_TIMESTAMP[indice_patron])
+    columnas['Autor'] = [limpieza_estricta_texto(a) for a in columnas['Autor']]
+    columnas['Mensaje'] = [limpieza_estricta_texto(m) for m in columnas['Mensaje']]
+    return columnas, conteo_sistema
+
+
+def detectar_patron(texto):
+    """
+    Detecta el formato del timestamp probando los patrones, en orden, sobre las
+    primeras líneas del chat (y sobre el chat completo si la muestra no basta).
+    Devuelve el índice del patrón en PATRONES_TIMESTAMP o None.
+    """
+    lineas = texto.splitlines()
+    muestras = [lineas[:LINEAS_MUESTRA]]
+    if len(lineas) > LINEAS_MUESTRA:
+        muestras.append(lineas)
+
+    for muestra in muestras:
+        for indice, patron in enumerate(PATRONES_TIMESTAMP):
+            columnas, _ = parsear_lineas(muestra, patron)
+            if len(columnas['Mensaje']) > MIN_MENSAJES_PATRON:
+                return indice
+    return None
+
+
+def dividir_en_trozos(texto, patron, num_trozos):
+    """
+    Corta el texto en `num_trozos` trozos de tamaño parecido. Cada corte se hace
+    justo antes de una línea que empieza un mensaje según `patron`, así un mensaje
+    de varias líneas nunca queda partido entre dos trozos.
+    """
+    tamano = max(1, len(texto) // num_trozos)
+    cortes = [0]
+    for objetivo in range(tamano, len(texto), tamano):
+        posicion = max(objetivo, cortes[-1])
+        while True:
+            salto = texto.find('\n', posicion)
+            if salto == -1:
+                posicion = len(texto)
+                break
+            posicion = salto + 1
+            fin_linea = texto.find('\n', posicion)
+            linea = texto[posicion:fin_linea if fin_linea != -1 else len(texto)]
+            if patron.match(RE_CONTROL.sub('', linea).strip()):
+                break
+        if posicion >= len(texto):
+            break
+        if posicion > cortes[-1]:
+            cortes.append(posicion)
+    cortes.append(len(texto))
+    return [texto[inicio:fin] for inicio, fin in zip(cortes, cortes[1:])]
+
+
+def sin_progreso(etapa, **contadores):
+    """Función de progreso por defecto: no informa de nada."""
+
+
+def parsear_chat(texto, umbral_paralelo=UMBRAL_PARSEO_PARALELO_BYTES, procesos=PROCESOS_PARSEO, progreso=None):
+    """
+    Parsea el texto decodificado de un chat.
+
+    Los chats que superan `umbral_paralelo` se dividen en trozos por inicio de
+    mensaje y se parsean en un pool de procesos; los resultados se concatenan en orden.
+    Si se pasa `progreso`, se llama como progreso('parsear', lineas_parseadas=..., lineas_totales=...)
+    tras cada trozo (los chats grandes también se trocean en el modo secuencial).
+    Devuelve (columnas, conteo de sistema, índice del patrón) o None si no se reconoce el formato.
+    """
+    progreso = progreso or sin_progreso
+    indice_patron = detectar_patron(texto)
+    if indice_patron is None:
+        return None
+
+    lineas_totales = texto.count('\n') + 1
+    progreso('parsear', lineas_parseadas=0, lineas_totales=lineas_totales)
+    patron = PATRONES_TIMESTAMP[indice_patron]
+
+    if len(texto) < umbral_paralelo or procesos < 2:
+        trozos = dividir_en_trozos(texto, patron, max(1, len(texto) // TAM_TROZO_PROGRESO))
+        parciales = _parsear_trozos(map(_parsear_bloque, trozos, [indice_patron] * len(trozos)),
+                                    trozos, lineas_totales, progreso)
+    else:
+        # Más trozos que procesos para repartir mejor la carga
+        trozos = dividir_en_trozos(texto, patron, procesos * 4)
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            try:
+                parciales = _parsear_trozos(pool.map(_parsear_bloque, trozos, [indice_patron] * len(trozos)),
+                                            trozos, lineas_totales, progreso)
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    columnas = {
+        clave: list(chain.from_iterable(parcial[clave] for parcial, _ in parciales))
+        for clave in ('Timestamp_str', 'Autor', 'Mensaje')
+    }
+    conteo_sistema = sum((conteo for _, conteo in parciales), Counter())
+    return columnas, conteo_sistema, indice_patron
+
+
+def _parsear_trozos(resultados, trozos, lineas_totales, progreso):
+    """Recoge en orden los resultados de cada trozo e informa del avance."""
+    parciales, lineas = [], 0
+    for trozo, parcial in zip(trozos, resultados):
+        parciales.append(parcial)
+        lineas += trozo.count('\n') + 1
+        progreso('parsear', lineas_parseadas=min(lineas, lineas_totales), lineas_totales=lineas_totales)
+    return parciales
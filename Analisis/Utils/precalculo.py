@@ -0,0 +1,231 @@
+import itertools
+import os
+import queue
+import threading
+
+import streamlit as st
+from streamlit import runtime
+
+from Analisis.Utils.resultados_modelo import huella_chat
+from Utils.memoria_sesiones import guardar_dato_sesion, obtener_dato_sesion, id_sesion_actual
+
+# --- Precálculo de Análisis en Segundo Plano ---
+# Al cargar un chat se programan todos los análisis. Los baratos (autores, actividad,
+# palabras) van primero; los que usan modelos después (las líneas de tiempo, que
+# ejecutan los modelos por lotes, y luego emociones y amistad, que reutilizan sus
+# probabilidades). Un análisis con dependencias no entra en la cola hasta que
+# terminan: así ningún hilo de fondo se queda bloqueado esperando a otra tarea
+# mientras los análisis baratos de otras sesiones esperan turno.
+# Los resultados se guardan en el registro de memoria de la sesión, así que al
+# elegir una opción normalmente ya están listos.
+
+# Hilos que calculan análisis (compartidos por todas las sesiones)
+HILOS_PRECALCULO = int(os.environ.get("WHATSENTICS_HILOS_PRECALCULO", "2"))
+
+PRIORIDAD_RAPIDA = 0
+PRIORIDAD_MODELO = 1
+# Cada cuánto (s) se avisa a quien espera un análisis que calcula otro hilo
+INTERVALO_ESPERA = 0.5
+
+PENDIENTE, CALCULANDO, LISTO, ERROR, CANCELADO = 'pendiente', 'calculando', 'listo', 'error', 'cancelado'
+
+
+class _TareaPrecalculo:
+    """Un análisis programado para el chat de una sesión."""
+
+    def __init__(self, id_sesion, nombre, huella, funcion, df_chat, prioridad, dependencias=()):
+        self.id_sesion = id_sesion
+        self.nombre = nombre
+        self.huella = huella
+        self.funcion = funcion
+        self.prioridad = prioridad
+        self.dependencias = tuple(dependencias)  # nombres de análisis que deben terminar antes
+        self.df_chat = df_chat
+        self.estado = PENDIENTE
+        self.error = None
+        self.terminada = threading.Event()
+
+
+class PlanificadorPrecalculo:
+    """
+    Cola de prioridad de análisis compartida por todas las sesiones, atendida por
+    unos pocos hilos. Una tarea que aún está en cola puede reclamarla el hilo del
+    script (si el usuario abre ese análisis), así nunca se calcula dos veces.
+    """
+
+    def __init__(self, hilos=HILOS_PRECALCULO):
+        self._cola = queue.PriorityQueue()
+        self._orden = itertools.count()  # desempate: orden de llegada
+        self._tareas = {}  # (id_sesion, nombre) -> _TareaPrecalculo
+        self._lock = threading.Lock()
+        for i in range(hilos):
+            threading.Thread(target=self._bucle, name=f"precalculo-{i}", daemon=True).start()
+
+    def programar(self, id_sesion, df_chat, analisis):
+        """
+        Programa los análisis [(nombre, prioridad, funcion, dependencias)] del chat de
+        la sesión. Los que ya están programados para este mismo chat no se repiten; los
+        que tienen dependencias pendientes entran en la cola cuando estas terminan.
+        """
+        huella = huella_chat(df_chat)
+        with self._lock:
+            self._purgar_sesiones_cerradas()
+            nuevas = []
+            for nombre, prioridad, funcion, dependencias in analisis:
+                anterior = self._tareas.get((id_sesion, nombre))
+                if anterior is not None and anterior.huella == huella and anterior.estado != ERROR:
+                    continue
+                if anterior is not None and anterior.estado == PENDIENTE:
+                    anterior.estado = CANCELADO
+                    anterior.terminada.set()
+                tarea = _TareaPrecalculo(id_sesion, nombre, huella, funcion, df_chat, prioridad, dependencias)
+                self._tareas[(id_sesion, nombre)] = tarea
+                nuevas.append(tarea)
+            for tarea in nuevas:
+                if self._dependencias_resueltas(tarea):
+                    self._cola.put((tarea.prioridad, next(self._orden), tarea))
+
+    def estado(self, id_sesion):
+        """{nombre: estado} de los análisis programados para la sesión."""
+        with self._lock:
+            return {nombre: t.estado for (id_s, nombre), t in self._tareas.items() if id_s == id_sesion}
+
+    def esperar(self, id_sesion, nombre, huella, al_esperar=None, **opciones):
+        """
+        Si el análisis está programado para este chat, espera a que termine; si aún
+        está en cola, lo ejecuta ya en el hilo que llama, pasando `opciones` a su
+        función (p. ej. un callback de progreso). Mientras lo calcula otro hilo, llama
+        a al_esperar() cada INTERVALO_ESPERA segundos. Devuelve True si terminó bien.
+        """
+        with self._lock:
+            tarea = self._tareas.get((id_sesion, nombre))
+            if tarea is None or tarea.huella != huella:
+                return False
+            reclamada = tarea.estado == PENDIENTE
+            if reclamada:
+                tarea.estado = CALCULANDO
+        if reclamada:
+            self._ejecutar(tarea, **opciones)
+        elif al_esperar is None:
+            tarea.terminada.wait()
+        else:
+            while not tarea.terminada.wait(INTERVALO_ESPERA):
+                al_esperar()
+        return tarea.estado == LISTO
+
+    def descartar(self, id_sesion):
+        """Cancela los análisis pendientes de la sesión y olvida su estado."""
+        with self._lock:
+            self._descartar(id_sesion)
+
+    # --- Internos ---
+
+    def _bucle(self):
+        while True:
+            _, _, tarea = self._cola.get()
+            with self._lock:
+                if tarea.estado != PENDIENTE:
+                    continue  # cancelada o reclamada por el hilo del script
+                tarea.estado = CALCULANDO
+            self._ejecutar(tarea)
+
+    def _ejecutar(self, tarea, **opciones):
+        try:
+            resultado = tarea.funcion(tarea.df_chat, id_sesion=tarea.id_sesion, **opciones)
+            if resultado is not None:
+                guardar_dato_sesion(f'precalculo_{tarea.nombre}', {'huella': tarea.huella, 'resultado': resultado},
+                                    id_sesion=tarea.id_sesion)
+            tarea.estado = LISTO
+        except Exception as e:
+            tarea.error = e
+            tarea.estado = ERROR
+        except BaseException:
+            # El hilo del script que la reclamó se detuvo (p. ej. por un rerun): vuelve a la cola
+            with self._lock:
+                vigente = self._tareas.get((tarea.id_sesion, tarea.nombre)) is tarea
+                if vigente:
+                    tarea.estado = PENDIENTE
+                    if self._dependencias_resueltas(tarea):
+                        self._cola.put((tarea.prioridad, next(self._orden), tarea))
+                else:
+                    tarea.estado = CANCELADO
+            if not vigente:
+                tarea.df_chat = None
+                tarea.terminada.set()
+            raise
+        tarea.df_chat = None
+        tarea.terminada.set()
+        with self._lock:
+            self._encolar_dependientes(tarea)
+
+    def _dependencias_resueltas(self, tarea):
+        """Llamar con self._lock adquirido."""
+        for nombre in tarea.dependencias:
+            dependencia = self._tareas.get((tarea.id_sesion, nombre))
+            if dependencia is not None and dependencia.huella == tarea.huella \
+                    and dependencia.estado in (PENDIENTE, CALCULANDO):
+                return False
+        return True
+
+    def _encolar_dependientes(self, terminada):
+        """Pone en la cola las tareas que solo esperaban a `terminada`. Llamar con self._lock adquirido."""
+        for tarea in list(self._tareas.values()):
+            if (tarea.id_sesion == terminada.id_sesion and tarea.estado == PENDIENTE
+                    and terminada.nombre in tarea.dependencias and self._dependencias_resueltas(tarea)):
+                self._cola.put((tarea.prioridad, next(self._orden), tarea))
+
+    def _descartar(self, id_sesion):
+        """Llamar con self._lock adquirido."""
+        for clave in [c for c in self._tareas if c[0] == id_sesion]:
+            tarea = self._tareas.pop(clave)
+            if tarea.estado == PENDIENTE:
+                tarea.estado = CANCELADO
+                tarea.df_chat = None
+                tarea.terminada.set()
+
+    def _purgar_sesiones_cerradas(self):
+        """Llamar con self._lock adquirido."""
+        if not runtime.exists():
+            return
+        instancia = runtime.get_instance()
+        for id_sesion in {id_s for id_s, _ in self._tareas}:
+            if not instancia.is_active_session(id_sesion):
+                self._descartar(id_sesion)
+
+
+@st.cache_resource
+def obtener_planificador():
+    """Planificador de precálculo compartido por todas las sesiones del proceso."""
+    return PlanificadorPrecalculo()
+
+
+def programar_precalculo(df_chat, analisis):
+    """Programa los análisis [(nombre, prioridad, funcion, dependencias)] del chat de la sesión actual."""
+    obtener_planificador().programar(id_sesion_actual(), df_chat, analisis)
+
+
+def estado_precalculo():
+    """{nombre: estado} de los análisis de la sesión actual."""
+    return obtener_planificador().estado(id_sesion_actual())
+
+
+def esperar_precalculo(nombre, df_chat, al_esperar=None, **opciones):
+    """Espera (o ejecuta ya) el precálculo de `nombre` para este chat, si está programado."""
+    return obtener_planificador().esperar(id_sesion_actual(), nombre, huella_chat(df_chat), al_esperar, **opciones)
+
+
+def resultado_precalculado(nombre, df_chat, calcular, al_esperar=None, **opciones):
+    """
+    Resultado del análisis `nombre` para este chat: el precalculado si existe; si no,
+    se calcula ahora con `calcular(df_chat, **opciones)` y se guarda para la próxima vez.
+    `opciones` y `al_esperar` se pasan también al precálculo (ver PlanificadorPrecalculo.esperar).
+    """
+    huella = huella_chat(df_chat)
+    esperar_precalculo(nombre, df_chat, al_esperar, **opciones)
+    guardado = obtener_dato_sesion(f'precalculo_{nombre}')
+    if guardado is not None and guardado['huella'] == huella:
+        return guardado['resultado']
+
+    resultado = calcular(df_chat, **opciones)
+    guardar_dato_sesion(f'precalculo_{nombre}', {'huella': huella, 'resultado': resultado})
+    return resultado
@@ -0,0 +1,109 @@
+import os
+import re
+
+import emoji
+import numpy as np
+import pandas as pd
+
+# --- Pre-filtro por Reglas ---
+# Muchos mensajes son triviales (risas, solo emojis, enlaces, números, "ok"...).
+# Estas reglas los etiquetan directamente para no enviarlos a los modelos.
+# Cada regla: patrón que debe cubrir TODO el mensaje y etiqueta por tarea
+# (None en una tarea = la etiqueta sale del léxico de emojis).
+
+# Una risa: "jaja", "jejej", "haha", "jsjs", "xd", "lol", "kkkk", "rsrs"...
+_RISA = r'(?:(?:j[aeiou]){2,}j?|(?:h[aeiou]){2,}h?|j[sj]{2,}|x+d+|lo+l|k{4,}|(?:rs){2,})'
+_SIGNOS_RISA = r'[\s!.¡?¿]'
+
+REGLAS = {
+    'url': {
+        'patron': r'\s*(?:https?://|www\.)\S+\s*',
+        'emotion': 'others', 'sentiment': 'NEU',
+    },
+    'numero': {
+        # Al menos una cifra: "..." o "!!!" solos no son números
+        'patron': r'[\s.,:;/+\-$%€#*()]*\d[\d\s.,:;/+\-$%€#*()]*',
+        'emotion': 'others', 'sentiment': 'NEU',
+    },
+    'risa': {
+        # Al menos una risa, con solo espacios o signos alrededor. Las risas con j y con h
+        # van por separado para que palabras como "hija" u "hoja" no cuenten como risa.
+        'patron': rf'{_SIGNOS_RISA}*{_RISA}(?:{_SIGNOS_RISA}*{_RISA})*{_SIGNOS_RISA}*',
+        'emotion': 'joy', 'sentiment': 'POS',
+    },
+    'acuse': {
+        # "bueno", "claro" y "ya" solo como palabra suelta: con signos ("bueno...", "ya!!") pueden no ser neutros
+        'patron': r'\s*(?:(?:ok[aiy]?|okis|okey|vale|va|sip?|sí|dale|listo|sale|aj[aá]|m{2,}|k|entendido|de acuerdo)[\s!.]*'
+                  r'|(?:bueno|claro|ya)\s*)',
+        'emotion': 'others', 'sentiment': 'NEU',
+    },
+    'emojis': {
+        'patron': None,  # se construye con todos los emojis conocidos
+        'emotion': None, 'sentiment': None,
+    },
+}
+
+# Reglas activas (configurable por variable de entorno, separadas por comas; vacío = desactivado)
+REGLAS_ACTIVAS = [r for r in os.environ.get("WHATSENTICS_REGLAS_PREFILTRO", ",".join(REGLAS)).split(",") if r in REGLAS]
+
+# Léxico emoji -> (emoción, sentimiento). Los emojis que no están aquí se marcan como neutros.
+LEXICO_EMOJIS = {
+    **{e: ('joy', 'POS') for e in "😂🤣😄😁😆😀😃😊☺😍🥰😘😻❤💕💖💗💙💚💛💜🧡🥳🎉👏🙌👍👌😎🤗😋😜😝😛🔥💪✨"},
+    **{e: ('sadness', 'NEG') for e in "😢😭😞😔😟🙁☹😿💔🥺😩😫"},
+    **{e: ('anger', 'NEG') for e in "😡😠🤬👿💢🖕😤"},
+    **{e: ('fear', 'NEG') for e in "😱😨😰😧😦🙀"},
+    **{e: ('surprise', 'NEU') for e in "😮😲😯🤯😳😵"},
+    **{e: ('disgust', 'NEG') for e in "🤢🤮😒🙄"},
+    **{e: ('others', 'POS') for e in "🙏🤝😇"},
+    **{e: ('others', 'NEU') for e in "🤔😐😑😶🤷"},
+}
+_EMOCION_EMOJI = {e: emocion for e, (emocion, _) in LEXICO_EMOJIS.items()}
+_SENTIMIENTO_EMOJI = {e: sentimiento for e, (_, sentimiento) in LEXICO_EMOJIS.items()}
+
+# Clase de caracteres con todos los códigos que forman emojis del paquete `emoji`.
+# Una clase es mucho más rápida que una alternancia con miles de secuencias.
+_CARACTERES_EMOJI = sorted({c for e in emoji.EMOJI_DATA for c in e})
+_CLASE_EMOJI = ''.join(re.escape(c) for c in _CARACTERES_EMOJI)
+# Modificadores que no cuentan como emoji propio: selector de variante, unión (ZWJ) y tonos de piel
+_MODIFICADORES = '\ufe0f\u200d\U0001F3FB-\U0001F3FF'
+REGLAS['emojis']['patron'] = rf'[{_CLASE_EMOJI}\s]+'
+RE_PRIMER_EMOJI = re.compile(rf'((?![{_MODIFICADORES}])[{_CLASE_EMOJI}])')
+
+
+def aplicar_prefiltro(mensajes, reglas=None):
+    """
+    Pre-clasifica los mensajes con reglas vectorizadas (una pasada de `str.fullmatch` por regla).
+
+    Devuelve un DataFrame alineado con `mensajes` con las columnas 'regla', 'emotion'
+    y 'sentiment'; las filas no resueltas tienen NaN y deben ir al modelo.
+    """
+    reglas = REGLAS_ACTIVAS if reglas is None else reglas
+    mensajes = pd.Series(mensajes, dtype=object).reset_index(drop=True).fillna('')
+    resultado = pd.DataFrame(index=mensajes.index, columns=['regla', 'emotion', 'sentiment'], dtype=object)
+    pendiente = np.ones(len(mensajes), dtype=bool)
+
+    for nombre in reglas:
+        regla = REGLAS[nombre]
+        candidatos = mensajes[pendiente]
+        if nombre == 'emojis':
+            # Descarte barato antes del patrón de emojis (muy largo): nada con letras o números
+            candidatos = candidatos[~candidatos.str.contains(r'\w', regex=True)]
+        if candidatos.empty:
+            continue
+        coincide = candidatos.str.fullmatch(regla['patron'], flags=re.IGNORECASE).fillna(False).to_numpy(dtype=bool)
+        indices = candidatos.index[coincide]
+        if indices.empty:
+            continue
+
+        resultado.loc[indices, 'regla'] = nombre
+        if nombre == 'emojis':
+            # Etiqueta según el primer emoji del mensaje (sin variantes de tono de piel)
+            primeros = mensajes[indices].str.extract(RE_PRIMER_EMOJI)[0]
+            resultado.loc[indices, 'emotion'] = primeros.map(_EMOCION_EMOJI).fillna('others')
+            resultado.loc[indices, 'sentiment'] = primeros.map(_SENTIMIENTO_EMOJI).fillna('NEU')
+        else:
+            resultado.loc[indices, 'emotion'] = regla['emotion']
+            resultado.loc[indices, 'sentiment'] = regla['sentiment']
+        pendiente[indices] = False
+
+    return resultado
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from Utils.Metodos import obtener_servidor_inferencia
+from Utils.memoria_sesiones import guardar_dato_sesion, obtener_dato_sesion
+from Analisis.Utils.prefiltro_reglas import aplicar_prefiltro
+
+# Tareas de los modelos: 'emotion' (emociones) y 'sentiment' (POS/NEU/NEG).
+TAREAS = ('emotion', 'sentiment')
+# Clases de los modelos de pysentimiento en español (se usan si no llega a ejecutarse el modelo)
+CLASES_POR_TAREA = {
+    'emotion': ('others', 'joy', 'sadness', 'anger', 'surprise', 'disgust', 'fear'),
+    'sentiment': ('NEG', 'NEU', 'POS'),
+}
+
+
+# Confianza mínima por defecto de cada modo de distribucion_etiquetas
+CONFIANZA_POR_MODO = {'argmax': 0.0, 'umbral': 0.5}
+
+
+def huella_chat(df_chat):
+    """
+    Identificador del contenido de un chat, para saber si unos resultados guardados
+    corresponden a él. Se calcula una vez y se guarda en df_chat.attrs.
+    """
+    huella = df_chat.attrs.get('huella')
+    if huella is None:
+        huella = format(int(pd.util.hash_pandas_object(
+            df_chat[['Timestamp', 'Autor', 'Mensaje']], index=False
+        ).sum()) & 0xFFFFFFFFFFFFFFFF, '016x')
+        df_chat.attrs['huella'] = huella
+    return huella
+
+
+def calcular_probabilidades(mensajes, tarea, usar_prefiltro=True):
+    """
+    Devuelve las probabilidades por clase del modelo `tarea` como una matriz float16
+    compacta (mensajes × clases).
+
+    Los mensajes triviales (risas, solo emojis, enlaces...) los resuelve antes el
+    pre-filtro de reglas con una probabilidad 1 en su clase; solo el resto va al modelo.
+    """
+    mensajes = list(mensajes)
+    if usar_prefiltro:
+        prefiltro = aplicar_prefiltro(mensajes)
+        resueltos = prefiltro[tarea].notna().to_numpy()
+    else:
+        prefiltro, resueltos = None, np.zeros(len(mensajes), dtype=bool)
+
+    indices_modelo = np.flatnonzero(~resueltos)
+    resultados = obtener_servidor_inferencia().predecir(tarea, [mensajes[i] for i in indices_modelo])
+
+    clases = list(resultados[0].probas.keys()) if resultados else list(CLASES_POR_TAREA[tarea])
+    probas = np.zeros((len(mensajes), len(clases)), dtype=np.float16)
+    if resultados:
+        probas[indices_modelo] = [[r.probas.get(c, 0.0) for c in clases] for r in resultados]
+
+    if resueltos.any():
+        indices_reglas = np.flatnonzero(resueltos)
+        columnas = pd.Index(clases).get_indexer(prefiltro[tarea].to_numpy()[indices_reglas])
+        conocidas = columnas >= 0  # por si el modelo no tuviera alguna clase de las reglas
+        probas[indices_reglas[conocidas], columnas[conocidas]] = 1.0
+
+    return {'clases': clases, 'probas': probas, 'resueltos_por_reglas': int(resueltos.sum())}
+
+
+def auditar_prefiltro(mensajes, tarea, muestra=200, semilla=0):
+    """
+    Compara, en una muestra de los mensajes que resuelve el pre-filtro, la etiqueta
+    de las reglas con la que daría el modelo. Devuelve la concordancia por regla.
+    """
+    prefiltro = aplicar_prefiltro(list(mensajes))
+    resueltos = prefiltro[prefiltro[tarea].notna()]
+    if resueltos.empty:
+        return pd.DataFrame(columns=['Mensajes', 'Concordancia (%)'])
+
+    seleccion = resueltos.sample(n=min(muestra, len(resueltos)), random_state=semilla)
+    textos = [mensajes[i] for i in seleccion.index]
+    modelo = etiquetas(calcular_probabilidades(textos, tarea, usar_prefiltro=False))
+
+    comparacion = pd.DataFrame({'Regla': seleccion['regla'].to_numpy(),
+                                'coincide': seleccion[tarea].to_numpy() == modelo})
+    auditoria = comparacion.groupby('Regla')['coincide'].agg(['size', 'mean'])
+    auditoria.columns = ['Mensajes', 'Concordancia (%)']
+    auditoria['Concordancia (%)'] *= 100
+    return auditoria
+
+
+def guardar_probabilidades(df_chat, tarea, resultado, id_sesion=None):
+    """Guarda en la sesión la matriz de probabilidades de `tarea` para este chat."""
+    guardar_dato_sesion(f'probas_{tarea}', {'huella': huella_chat(df_chat), **resultado}, id_sesion=id_sesion)
+
+
+def obtener_probabilidades(df_chat, tarea, id_sesion=None):
+    """
+    Devuelve {'clases': [...], 'probas': matriz float16} del modelo `tarea` para el chat.
+    Si la sesión ya los tiene (calculados antes o cargados de un archivo exportado)
+    no se vuelve a ejecutar el modelo.
+    """
+    guardado = obtener_dato_sesion(f'probas_{tarea}', id_sesion=id_sesion)
+    if guardado is not None and guardado['huella'] == huella_chat(df_chat):
+        return guardado
+
+    resultado = calcular_probabilidades(df_chat['Mensaje'], tarea)
+    guardar_probabilidades(df_chat, tarea, resultado, id_sesion=id_sesion)
+    return {'huella': huella_chat(df_chat), **resultado}
+
+
+def etiquetas(resultado):
+    """Etiqueta más probable de cada mensaje (argmax de la matriz de probabilidades)."""
+    if resultado['probas'].size == 0:
+        return np.array([], dtype=object)
+    return np.asarray(resultado['clases'], dtype=object)[resultado['probas'].argmax(axis=1)]
+
+
+def codigos_etiquetas(resultado):
+    """Código (índice en resultado['clases']) de la etiqueta más probable de cada mensaje, como int8."""
+    if resultado['probas'].size == 0:
+        return np.array([], dtype=np.int8)
+    return resultado['probas'].argmax(axis=1).astype(np.int8)
+
+
+def distribucion_etiquetas(resultado, confianza_min=None, incluir_otros=True, modo='argmax', clase_otros='others'):
+    """
+    Recalcula la distribución de etiquetas desde la matriz guardada, sin volver a
+    ejecutar el modelo.
+
+    - modo 'argmax': cada mensaje cuenta para su clase más probable, si esa
+      probabilidad alcanza `confianza_min`.
+    - modo 'umbral': cada mensaje cuenta para TODAS las clases cuya probabilidad
+      supera `confianza_min` (puede contar en varias o en ninguna).
+    - Sin `confianza_min` se usa el de CONFIANZA_POR_MODO (en 'umbral' no puede
+      ser 0: todas las probabilidades lo superarían y todas las clases empatarían).
+    - `incluir_otros`: si es False se descarta la clase `clase_otros`.
+
+    Devuelve (conteo por clase, mensajes que no superaron el umbral).
+    """
+    if confianza_min is None:
+        confianza_min = CONFIANZA_POR_MODO[modo]
+    clases = np.asarray(resultado['clases'], dtype=object)
+    probas = resultado['probas'].astype(np.float32)
+    if probas.size == 0:
+        return pd.Series(0, index=clases), 0
+
+    if modo == 'argmax':
+        indice = probas.argmax(axis=1)
+        confiable = probas[np.arange(len(indice)), indice] >= confianza_min
+        conteo = np.bincount(indice[confiable], minlength=len(clases))
+        descartados = int((~confiable).sum())
+    else:
+        supera = probas > confianza_min
+        conteo = supera.sum(axis=0)
+        descartados = int((~supera.any(axis=1)).sum())
+
+    conteo = pd.Series(conteo, index=clases)
+    if not incluir_otros:
+        conteo = conteo.drop(clase_otros, errors='ignore')
+    return conteo, descartados
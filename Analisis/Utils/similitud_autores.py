@@ -0,0 +1,107 @@
+import string
+import re
+
+import numpy as np
+import pandas as pd
+
+# Máximo de términos (columnas) de la matriz autor × término.
+MAX_TERMINOS = 5000
+
+RE_RUIDO = re.compile(r'http\S+|@\w+|#\w+')
+RE_PUNTUACION = re.compile('[' + re.escape(string.punctuation + '¿¡“”') + ']')
+
+
+def matriz_autor_termino(df_chat, stop_words, max_terminos=MAX_TERMINOS):
+    """
+    Construye la matriz autor × término (TF-IDF, filas normalizadas) a partir de todos
+    los mensajes con operaciones vectorizadas de pandas, sin bucles por autor.
+
+    Solo se conservan términos que usan al menos dos autores (los únicos que aportan
+    a la similitud entre autores), hasta `max_terminos` por frecuencia.
+    Devuelve (matriz float32 [autores × términos], nombres_autores, términos).
+    """
+    palabras = (
+        df_chat['Mensaje'].str.lower()
+        .str.replace(RE_RUIDO, '', regex=True)
+        .str.replace(RE_PUNTUACION, '', regex=True)
+        .str.split()
+    )
+    tokens = pd.DataFrame({'Autor': df_chat['Autor'].to_numpy(), 'Termino': palabras.to_numpy()}).explode('Termino')
+    tokens = tokens.dropna(subset=['Termino'])
+    tokens = tokens[
+        (tokens['Termino'].str.len() > 2)
+        & ~tokens['Termino'].isin(list(stop_words))
+        & ~tokens['Termino'].str.isdigit()
+    ]
+
+    _, autores = pd.factorize(df_chat['Autor'])
+    if tokens.empty:
+        return np.zeros((len(autores), 0), dtype=np.float32), autores, np.array([], dtype=object)
+
+    # Conteo (autor, término) en formato disperso (coordenadas + valores)
+    conteos = tokens.groupby(['Autor', 'Termino'], sort=False).size().rename('n').reset_index()
+
+    # Frecuencia de documento: en cuántos autores aparece cada término
+    df_termino = conteos['Termino'].value_counts()
+    compartidos = df_termino[df_termino >= 2].head(max_terminos)
+    conteos = conteos[conteos['Termino'].isin(compartidos.index)]
+
+    terminos = compartidos.index.to_numpy()
+    fila = autores.get_indexer(conteos['Autor'])
+    columna = pd.Index(terminos).get_indexer(conteos['Termino'])
+
+    matriz = np.zeros((len(autores), len(terminos)), dtype=np.float32)
+    matriz[fila, columna] = np.log1p(conteos['n'].to_numpy(dtype=np.float32))
+
+    # Ponderación IDF y normalización L2 por autor
+    idf = np.log((1 + len(autores)) / (1 + compartidos.to_numpy(dtype=np.float32))) + 1
+    matriz *= idf.astype(np.float32)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    matriz /= np.where(normas > 0, normas, 1)
+
+    return matriz, autores, terminos
+
+
+def similitud_intereses(matriz):
+    """Similitud coseno entre todos los pares de autores (producto de matrices)."""
+    return matriz @ matriz.T
+
+
+def similitud_sentimiento(autores_mensajes, etiquetas, autores):
+    """
+    Sincronía emocional entre todos los pares de autores: coeficiente de Bhattacharyya
+    entre sus distribuciones de sentimiento (1 = distribuciones idénticas).
+    """
+    distribucion = pd.crosstab(pd.Series(autores_mensajes, name='Autor'), pd.Series(etiquetas, name='Sent'),
+                               normalize='index')
+    distribucion = distribucion.reindex(autores, fill_value=0).to_numpy(dtype=np.float32)
+    raiz = np.sqrt(distribucion)
+    return raiz @ raiz.T
+
+
+def puntaje_grupal(similitud, pesos=None):
+    """
+    Puntaje 0-100 del grupo: media de la similitud de todos los pares distintos,
+    ponderada opcionalmente por la participación de los autores de cada par.
+    """
+    n = similitud.shape[0]
+    if n < 2:
+        return 0.0
+    i, j = np.triu_indices(n, k=1)
+    w = np.ones(len(i)) if pesos is None else np.minimum(pesos[i], pesos[j])
+    return float(np.average(similitud[i, j], weights=w) * 100) if w.sum() > 0 else 0.0
+
+
+def orden_agrupado(similitud):
+    """
+    Orden de autores que agrupa a los más parecidos (orden espectral: vector de Fiedler
+    del laplaciano de la matriz de similitud). Se usa para dibujar el mapa de calor.
+    """
+    n = similitud.shape[0]
+    if n < 3:
+        return np.arange(n)
+    afinidad = np.clip(similitud, 0, None).astype(np.float64)
+    np.fill_diagonal(afinidad, 0)
+    laplaciano = np.diag(afinidad.sum(axis=1)) - afinidad
+    _, vectores = np.linalg.eigh(laplaciano)
+    return np.argsort(vectores[:, 1], kind='stable')
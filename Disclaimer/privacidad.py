@@ -17,8 +17,11 @@ def show_privacy_notice():
     2.  Alimentar los modelos de análisis de sentimientos.
     3.  Generar los gráficos que se le muestran.
 
-    **Esta aplicación NO almacena sus datos en ningún servidor.**
-    
+    **Esta aplicación NO guarda sus datos de forma permanente: solo los mantiene mientras dura su sesión.**
+    Si la memoria del servidor se agota mientras su sesión está inactiva, pueden escribirse en un
+    archivo temporal en disco, **comprimidos y cifrados** con una clave que solo existe en memoria.
+    Ese archivo se borra en cuanto vuelve a usar la aplicación o su sesión termina.
+
     Toda la información (incluyendo los gráficos generados y los datos cacheados) se elimina permanentemente 
     en el momento en que usted cierra la pestaña del navegador o actualiza esta página.
     
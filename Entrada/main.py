@@ -1,11 +1,59 @@
 import streamlit as st
-from Analisis.Utils.aux_opciones import procesar_chat
-from Analisis.Opciones.msgcount_01 import mostrar_analisis_conversacion
-from Analisis.Opciones.sentimientos_02 import analizar_emociones
-from Analisis.Opciones.analizar_nivel_amistad_03 import analizar_nivel_amistad
-from Analisis.Opciones.actividad_04 import analizar_actividad
-from Analisis.Opciones.palabras_05 import analizar_palabras_y_emojis
+from Analisis.Utils.ingesta import iniciar_ingesta, recoger_ingesta, descartar_ingesta, mostrar_ingesta
+from Analisis.Utils.mensajes_sistema import NOMBRES_CATEGORIAS
+from Analisis.Utils.resultados_modelo import TAREAS, obtener_probabilidades, guardar_probabilidades, huella_chat
+from Analisis.Utils.precalculo import (
+    PRIORIDAD_RAPIDA, PRIORIDAD_MODELO, LISTO, ERROR,
+    programar_precalculo, estado_precalculo, obtener_planificador
+)
+from Analisis.Utils.exportacion import exportar_parquet, cargar_parquet
+from Analisis.Opciones.msgcount_01 import mostrar_analisis_conversacion, calcular_autores
+from Analisis.Opciones.sentimientos_02 import analizar_emociones, precalcular_emociones
+from Analisis.Opciones.analizar_nivel_amistad_03 import analizar_nivel_amistad, calcular_amistad
+from Analisis.Opciones.actividad_04 import analizar_actividad, calcular_actividad
+from Analisis.Opciones.palabras_05 import analizar_palabras_y_emojis, calcular_conteos_palabras
+from Analisis.Opciones.evolucion_06 import analizar_evolucion
+from Analisis.Opciones.comparacion_chats import comparar_chats
+from Analisis.Utils.lineas_tiempo import calcular_lineas_tiempo, esperar_probabilidades
 from Disclaimer.privacidad import show_privacy_notice
+from Utils.Metodos import obtener_servidor_inferencia
+from Utils.memoria_sesiones import (
+    guardar_dato_sesion, obtener_dato_sesion, eliminar_datos_sesion,
+    obtener_registro_memoria, id_sesion_actual
+)
+
+# Análisis que se precalculan en segundo plano al cargar un chat:
+# (nombre, etiqueta, prioridad, función, análisis que deben terminar antes)
+ANALISIS_PRECALCULO = [
+    ('autores', "Autores", PRIORIDAD_RAPIDA, calcular_autores, ()),
+    ('actividad', "Actividad y horarios", PRIORIDAD_RAPIDA, calcular_actividad, ()),
+    ('palabras', "Palabras y emojis", PRIORIDAD_RAPIDA, calcular_conteos_palabras, ()),
+    # Ejecuta los modelos por lotes y guarda las probabilidades que reutilizan emociones y amistad
+    ('lineas_tiempo', "Evolución en el tiempo", PRIORIDAD_MODELO, calcular_lineas_tiempo, ()),
+    ('emociones', "Emociones", PRIORIDAD_MODELO, precalcular_emociones, ('lineas_tiempo',)),
+    ('amistad', "Nivel de amistad", PRIORIDAD_MODELO, calcular_amistad, ('lineas_tiempo',)),
+]
+
+
+def mostrar_estado_precalculo():
+    """
+    Lista qué análisis están listos. Mientras quede alguno pendiente se refresca
+    sola cada segundo (como fragmento, sin volver a ejecutar toda la app).
+    """
+    def contenido():
+        estados = estado_precalculo()
+        for nombre, etiqueta, _, _, _ in ANALISIS_PRECALCULO:
+            estado = estados.get(nombre)
+            icono = "✅" if estado == LISTO else "⚠️" if estado == ERROR else "⏳"
+            st.write(f"{icono} {etiqueta}")
+        if pendientes and all(e in (LISTO, ERROR) for e in estados.values()):
+            st.rerun()  # todo listo: se redibuja la app para dejar de refrescar
+
+    estados = estado_precalculo()
+    pendientes = any(e not in (LISTO, ERROR) for e in estados.values())
+    with st.expander("📊 Análisis preparados", expanded=pendientes):
+        st.fragment(contenido, run_every=1.0 if pendientes else None)()
+
 
 def main():
     """
@@ -23,17 +71,22 @@ def main():
     if 'privacy_accepted' not in st.session_state:
         st.session_state.privacy_accepted = False
     
-    if 'df_chat' not in st.session_state:
-        st.session_state.df_chat = None
+    if 'file_name' not in st.session_state:
         st.session_state.file_name = None
         st.cache_data.clear()
-        st.cache_resource.clear()
 
     # --- 3. PUERTA DE PRIVACIDAD ---
     if not st.session_state.privacy_accepted:
         show_privacy_notice()
         return 
 
+    # El chat vive en el registro de memoria del servidor (no en st.session_state),
+    # que lo vuelca cifrado a disco si la sesión queda inactiva y falta memoria.
+    df_chat = obtener_dato_sesion('df_chat')
+    if df_chat is None:
+        # Si la ingesta en segundo plano ya terminó, su chat pasa a la sesión
+        df_chat = recoger_ingesta()
+
     # --- 4. Título de Bienvenida ---
     st.title("Bienvenido al Analizador de Sentimientos 💬")
 
@@ -45,64 +98,87 @@ def main():
     # --- 6. Columna de Controles (Izquierda) ---
     with col_controles:
         st.header("1. Carga tu Archivo")
+
+        modo_comparacion = st.toggle(
+            "Comparar varios chats", key='modo_comparacion',
+            help="Sube varios chats para ver sus autores, actividad, emociones y amistad lado a lado."
+        )
         
         # --- Lógica de Carga de Archivo ---
-        if st.session_state.df_chat is None:
+        if modo_comparacion:
+            # Cada chat se analiza una sola vez: añadir o quitar uno no recalcula los demás
+            archivos_comparacion = st.file_uploader(
+                "Selecciona los chats a comparar (.zip, .txt o .parquet)",
+                type=["zip", "txt", "parquet"],
+                accept_multiple_files=True,
+                key='archivos_comparacion'
+            )
+        elif df_chat is None:
             uploaded_file = st.file_uploader(
                 "Selecciona tu archivo .zip o .txt",
-                type=["zip", "txt"],
-                help="Exporta tu chat desde WhatsApp (sin multimedia) y súbelo aquí."
+                type=["zip", "txt", "parquet"],
+                help="Exporta tu chat desde WhatsApp (sin multimedia) y súbelo aquí. "
+                     "También puedes subir un .parquet exportado por esta app para saltarte el análisis."
             )
             
-            if uploaded_file is not None:
-                mensajes_eliminados = 0
-                with st.spinner("Procesando tu chat... ¡Esto puede tardar un momento!"):
-                    
-                    # 1. Carga inicial del chat
-                    df_inicial = procesar_chat(uploaded_file)
-                    
-                    # 2. --- NUEVA LIMPIEZA CENTRALIZADA ---
-                    # Verificamos que el DataFrame se haya cargado y tenga la columna 'Mensaje'
-                    if df_inicial is not None and not df_inicial.empty and 'Mensaje' in df_inicial.columns:
-                        total_antes = len(df_inicial)
-                        
-                        # Definir los filtros. case=False ignora mayúsculas/minúsculas.
-                        # na=False asegura que los valores NaN no causen errores
-                        filtro_eliminaste = ~df_inicial['Mensaje'].str.contains(
-                            "eliminaste este mensaje", case=False, na=False
-                        )
-                        filtro_se_elimino = ~df_inicial['Mensaje'].str.contains(
-                            "se eliminó este mensaje", case=False, na=False
-                        )
-                        
-                        # Aplicar ambos filtros
-                        df_limpio = df_inicial[filtro_eliminaste & filtro_se_elimino]
-                        
-                        total_despues = len(df_limpio)
-                        mensajes_eliminados = total_antes - total_despues
-                        
-                        # Guardar el DataFrame limpio en el estado de la sesión
-                        st.session_state.df_chat = df_limpio
-                    else:
-                        # Si el df está vacío o no tiene 'Mensaje', simplemente guardarlo
-                        st.session_state.df_chat = df_inicial
-                    # --- FIN DE LA LIMPIEZA ---
-
-                    st.session_state.file_name = uploaded_file.name
-                
-                st.success("¡Chat procesado con éxito!")
-                
-                # Informar al usuario sobre la limpieza
-                if mensajes_eliminados > 0:
-                    st.info(f"Se han omitido **{mensajes_eliminados}** mensajes eliminados del análisis.")
-                
-                st.rerun() 
+            if uploaded_file is not None and uploaded_file.name.endswith('.parquet'):
+                # Archivo exportado por la app: ya trae el chat limpio y las predicciones de los modelos
+                try:
+                    df_inicial, resultados = cargar_parquet(uploaded_file.getvalue())
+                except Exception as e:
+                    st.error(f"No se pudo leer el archivo exportado: {e}")
+                    return
+
+                guardar_dato_sesion('df_chat', df_inicial)
+                for tarea, resultado in resultados.items():
+                    guardar_probabilidades(df_inicial, tarea, resultado)
+                st.session_state.file_name = uploaded_file.name
+                st.session_state.mensajes_sistema = df_inicial.attrs.get('mensajes_sistema', {})
+                st.rerun()
+
+            elif uploaded_file is not None:
+                # El chat se lee en segundo plano (ver Analisis/Utils/ingesta.py). La lectura ya
+                # descarta los mensajes de sistema (eliminados, multimedia, avisos del grupo...)
+                # en español, inglés y portugués, y los cuenta por categoría.
+                iniciar_ingesta(uploaded_file)
+
+            if 'ingesta' in st.session_state:
+                mostrar_ingesta(st.session_state.ingesta)
         
         else:
             # Estado B: Ya hay un archivo cargado
             st.success(f"Archivo cargado: **{st.session_state.file_name}**")
+
+            # Todos los análisis se calculan en segundo plano (si ya están programados no se repiten)
+            programar_precalculo(df_chat, [(n, p, f, d) for n, _, p, f, d in ANALISIS_PRECALCULO])
+            mostrar_estado_precalculo()
+
+            # Informar al usuario sobre la limpieza
+            mensajes_sistema = st.session_state.get('mensajes_sistema', {})
+            total_sistema = sum(mensajes_sistema.values())
+            if total_sistema > 0:
+                detalle = ", ".join(
+                    f"{n} {NOMBRES_CATEGORIAS.get(cat, cat)}"
+                    for cat, n in sorted(mensajes_sistema.items(), key=lambda x: -x[1])
+                )
+                st.info(f"Se han omitido **{total_sistema}** mensajes de sistema del análisis ({detalle}).")
             st.write("Diez mensajes más recientes:")
-            st.dataframe(st.session_state.df_chat[['Autor', 'Mensaje']].tail(10))
+            st.dataframe(df_chat[['Autor', 'Mensaje']].tail(10))
+
+            # --- Exportación de la tabla enriquecida ---
+            if st.button("📦 Exportar mensajes con emociones y sentimientos"):
+                with st.spinner("Calculando emociones y sentimientos de cada mensaje..."):
+                    esperar_probabilidades(df_chat)
+                    resultados = {tarea: obtener_probabilidades(df_chat, tarea) for tarea in TAREAS}
+                    archivo_parquet = exportar_parquet(df_chat, resultados)
+                nombre_base = st.session_state.file_name.rsplit('.', 1)[0]
+                st.download_button(
+                    "⬇️ Descargar .parquet",
+                    data=archivo_parquet,
+                    file_name=f"{nombre_base}_analizado.parquet",
+                    mime="application/vnd.apache.parquet",
+                    on_click="ignore"
+                )
             # URL de tu perfil
             linkedin_url = "https://www.linkedin.com/in/fernando-rodriguezr/"
 
@@ -127,14 +203,48 @@ def main():
             st.empty()
             st.markdown("---")
             if st.button("Cargar otro archivo"):
-                st.session_state.df_chat = None
+                obtener_planificador().descartar(id_sesion_actual())
+                descartar_ingesta()
+                eliminar_datos_sesion()
                 st.session_state.file_name = None
+                st.session_state.mensajes_sistema = {}
                 st.cache_data.clear()
-                st.cache_resource.clear()
+                # st.cache_resource NO se limpia: el servidor de inferencia es compartido por todas las sesiones
                 st.rerun()
 
+        # --- Estado del Servidor de Inferencia (compartido entre sesiones) ---
+        with st.expander("⚙️ Estado del servidor de inferencia"):
+            metricas = obtener_servidor_inferencia().metricas()
+            en_cola = metricas['mensajes_en_cola']
+            st.write(f"Mensajes en cola: {sum(en_cola.values())}"
+                     + (f" ({' · '.join(f'{tarea}: {n}' for tarea, n in en_cola.items())})" if en_cola else ""))
+            st.write(f"Solicitudes atendidas: {metricas['solicitudes_atendidas']} "
+                     f"({metricas['mensajes_atendidos']} mensajes)")
+            st.write(f"Latencia por solicitud: p50 {metricas['latencia_p50_ms']:.0f} ms · "
+                     f"p95 {metricas['latencia_p95_ms']:.0f} ms · máx {metricas['latencia_max_ms']:.0f} ms")
+            st.write(f"Tamaño medio de lote: {metricas['tam_lote_medio']:.1f} · Hilos de CPU: {metricas['hilos_torch']}")
+            st.write(f"Mensajes largos: {metricas['mensajes_largos']} ({metricas['ventanas_largos']} ventanas) · "
+                     f"{metricas['porcentaje_computo_largos']:.0f}% del cómputo "
+                     f"({metricas['segundos_largos']:.1f} s de {metricas['segundos_cortos'] + metricas['segundos_largos']:.1f} s)")
+
+            modelos = metricas['modelos']
+            residentes = ", ".join(f"{t} ({b / 2**20:.0f} MB)" for t, b in modelos['residentes'].items()) or "ninguno"
+            presupuesto = f"{modelos['presupuesto'] / 2**20:.0f} MB" if modelos['presupuesto'] else "sin límite"
+            st.write(f"Modelos en memoria: {residentes} · presupuesto {presupuesto}")
+            st.write(f"Cargas: {modelos['cargas']} · Expulsiones: {modelos['expulsiones']} · "
+                     f"Aciertos: {modelos['aciertos']}")
+
+            uso = obtener_registro_memoria().uso(id_sesion_actual())
+            st.write(f"Memoria de tu sesión: {uso['sesion'] / 2**20:.1f} MB")
+            st.write(f"Memoria de todas las sesiones: {uso['total'] / 2**20:.1f} / {uso['presupuesto'] / 2**20:.0f} MB "
+                     f"({uso['sesiones']} sesiones, {uso['sesiones_volcadas']} volcadas a disco)")
+
     # --- 7. Columna de Resultados (Derecha) ---
     with col_resultados:
+        if modo_comparacion:
+            comparar_chats(archivos_comparacion)
+            return
+
         st.header("2. Elige un Análisis")
         opciones = [
             "Selecciona una opción...",
@@ -142,33 +252,37 @@ def main():
             "2. Análisis de Emociones",
             "3. Análisis de Nivel de Amistad",
             "4. Análisis de Actividad y Horarios", 
-            "5. Palabras y Emojis Más Usados"   
+            "5. Palabras y Emojis Más Usados",
+            "6. Evolución de Emociones y Sentimientos"
         ]
         
         opcion_elegida = st.selectbox(
             "Elige el tipo de análisis que deseas ver:",
             options=opciones,
-            disabled=(st.session_state.df_chat is None) 
+            disabled=(df_chat is None) 
         )
         
         st.header("Resultados del Análisis")
 
         # Mostrar resultados basados en la selección
-        if st.session_state.df_chat is not None:
+        if df_chat is not None:
             if opcion_elegida == "1. Análisis de Autores":
-                mostrar_analisis_conversacion(st.session_state.df_chat)
+                mostrar_analisis_conversacion(df_chat, huella_chat(df_chat))
                 
             elif opcion_elegida == "2. Análisis de Emociones":
-                analizar_emociones(st.session_state.df_chat)
+                analizar_emociones(df_chat)
                 
             elif opcion_elegida == "3. Análisis de Nivel de Amistad":
-                analizar_nivel_amistad(st.session_state.df_chat)
+                analizar_nivel_amistad(df_chat, huella_chat(df_chat))
             
             elif opcion_elegida == "4. Análisis de Actividad y Horarios":
-                analizar_actividad(st.session_state.df_chat)
+                analizar_actividad(df_chat, huella_chat(df_chat))
             
             elif opcion_elegida == "5. Palabras y Emojis Más Usados":
-                analizar_palabras_y_emojis(st.session_state.df_chat)
+                analizar_palabras_y_emojis(df_chat, huella_chat(df_chat))
+
+            elif opcion_elegida == "6. Evolución de Emociones y Sentimientos":
+                analizar_evolucion(df_chat)
 
             elif opcion_elegida == "Selecciona una opción...":
                 st.info("Selecciona un análisis para ver los resultados aquí.")
@@ -0,0 +1,355 @@
+"""
+Prueba de carga del Analizador de Chats: simula N sesiones simultáneas con AppTest.
+
+Cada sesión acepta el aviso de privacidad, sube un chat sintético y recorre las
+opciones de análisis. Los modelos se sustituyen por un modelo simulado
+(sin red ni pesos), con un coste por mensaje configurable.
+
+Uso (desde la raíz del proyecto):
+    python Herramientas/prueba_carga.py --sesiones 8 --mensajes 5000
+    python Herramientas/prueba_carga.py --sesiones 16 --mensajes 20000 --salida resultados_carga
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import psutil
+import streamlit as st
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import app_test as modulo_app_test
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.testing.v1.util import patch_config_options
+
+import Utils.almacen_modelos as almacen_modelos
+from Analisis.Utils.ingesta import EN_CURSO
+import Utils.Metodos as metodos
+from Utils.memoria_sesiones import obtener_registro_memoria
+
+# Clases de los modelos reales (el modelo simulado devuelve las mismas)
+CLASES_MODELO = {
+    'emotion': ['others', 'joy', 'sadness', 'anger', 'surprise', 'disgust', 'fear'],
+    'sentiment': ['NEG', 'NEU', 'POS'],
+}
+PALABRAS = (
+    "hola que tal bien gracias mañana vamos casa trabajo comida fiesta cine partido "
+    "perro gato viaje playa lluvia frío calor clase examen jefe reunión cumpleaños "
+    "pizza café cerveza música película serie libro foto video grupo familia amigos"
+).split()
+RELLENOS = ["jajaja", "😂😂", "ok", "👍", "https://ejemplo.com/x", "jsjsjs", "vale"]
+
+
+# --- Modelo Simulado ---
+
+class _Contador:
+    """Cuenta las llamadas al modelo que se ejecutan a la vez (y el máximo alcanzado)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.activas = 0
+        self.max_activas = 0
+        self.llamadas = 0
+        self.mensajes = 0
+
+    def entrar(self, n):
+        with self._lock:
+            self.activas += 1
+            self.llamadas += 1
+            self.mensajes += n
+            self.max_activas = max(self.max_activas, self.activas)
+
+    def salir(self):
+        with self._lock:
+            self.activas -= 1
+
+
+class _SalidaSimulada:
+    """Imita a AnalyzerOutput de pysentimiento (atributos `output` y `probas`)."""
+
+    def __init__(self, output, probas):
+        self.output = output
+        self.probas = probas
+
+
+class ModeloSimulado:
+    """
+    Sustituto de `create_analyzer`: probabilidades deterministas por texto y una
+    espera de `costo_ms` por mensaje para imitar el coste de la inferencia.
+    """
+
+    def __init__(self, task, costo_ms, contador):
+        self.clases = CLASES_MODELO[task]
+        self.costo_ms = costo_ms
+        self.contador = contador
+
+    def predict(self, textos):
+        unico = isinstance(textos, str)
+        textos = [textos] if unico else list(textos)
+        self.contador.entrar(len(textos))
+        try:
+            time.sleep(self.costo_ms * len(textos) / 1000)
+            salidas = []
+            for texto in textos:
+                pesos = np.random.default_rng(zlib.crc32(texto.encode('utf-8'))).random(len(self.clases))
+                probas = dict(zip(self.clases, (pesos / pesos.sum()).tolist()))
+                salidas.append(_SalidaSimulada(max(probas, key=probas.get), probas))
+        finally:
+            self.contador.salir()
+        return salidas[0] if unico else salidas
+
+
+# --- Chats Sintéticos ---
+
+class ArchivoSintetico(BytesIO):
+    """Imita al UploadedFile de Streamlit (`name` y `getvalue()`)."""
+
+    def __init__(self, nombre, contenido):
+        super().__init__(contenido)
+        self.name = nombre
+
+
+def generar_chat(num_mensajes, num_autores, semilla=0):
+    """Exportación de WhatsApp sintética, con mensajes multilínea y avisos del sistema."""
+    rng = random.Random(semilla)
+    autores = [f"Persona {i + 1}" for i in range(num_autores)]
+    momento = datetime(2024, 1, 1, 8, 0)
+    lineas = [f"{momento:%d/%m/%y, %H:%M} - {autores[0]} creó el grupo \"Prueba\""]
+    for _ in range(num_mensajes):
+        momento += timedelta(minutes=rng.choice([0, 1, 1, 2, 5, 30, 240]))
+        prefijo = f"{momento:%d/%m/%y, %H:%M} - "
+        sorteo = rng.random()
+        if sorteo < 0.03:
+            lineas.append(f"{prefijo}{rng.choice(autores)}: <Multimedia omitido>")
+        elif sorteo < 0.20:
+            lineas.append(f"{prefijo}{rng.choice(autores)}: {rng.choice(RELLENOS)}")
+        else:
+            texto = " ".join(rng.choices(PALABRAS, k=rng.randint(3, 25)))
+            lineas.append(f"{prefijo}{rng.choice(autores)}: {texto}")
+            if rng.random() < 0.1:
+                lineas.append(" ".join(rng.choices(PALABRAS, k=rng.randint(3, 10))))
+    return "\n".join(lineas).encode('utf-8')
+
+
+# --- Sesiones Concurrentes con AppTest ---
+# AppTest está pensado para una sesión a la vez: usa un id de sesión fijo y
+# sustituye el Runtime global en cada ejecución. Aquí cada hilo usa su propio id
+# y todas las sesiones comparten un único Runtime, como en un servidor real.
+
+_hilo = threading.local()
+
+
+class _ScriptRunnerPorSesion(LocalScriptRunner):
+    """LocalScriptRunner con el id de sesión del hilo que lo crea."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_id = _hilo.id_sesion
+
+
+class _RuntimeIgnorado:
+    """Destino de las asignaciones `Runtime._instance = ...` de AppTest (se ignoran)."""
+    _instance = None
+
+
+# AppTest no puede subir archivos: st.file_uploader se sustituye por uno que
+# devuelve el chat sintético de la sesión que ejecuta el script
+_archivos_por_sesion = {}
+_file_uploader_original = st.file_uploader
+
+
+def _file_uploader_simulado(label, *args, accept_multiple_files=False, **kwargs):
+    if accept_multiple_files:
+        return _file_uploader_original(label, *args, accept_multiple_files=True, **kwargs)
+    return _archivos_por_sesion.get(get_script_run_ctx().session_id)
+
+
+def _runtime_compartido():
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.is_active_session.return_value = True
+    return runtime
+
+
+def _medir(registros, sesion, paso, accion):
+    """Ejecuta `accion` (una ejecución de AppTest) y guarda su duración y si falló."""
+    inicio = time.perf_counter()
+    error = None
+    try:
+        at = accion()
+        if at.exception:
+            # Primera línea con texto del mensaje de la excepción
+            error = next((l for l in at.exception[0].message.splitlines() if l.strip('* ')), '')
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    registros.append({'sesion': sesion, 'paso': paso,
+                      'segundos': time.perf_counter() - inicio, 'error': error})
+
+
+def cargar_chat(at, timeout, intervalo=0.1):
+    """
+    Sube el chat y espera a que termine su ingesta en segundo plano (en el navegador
+    la refresca el fragmento de progreso; AppTest no ejecuta fragmentos periódicos).
+    """
+    at.run()
+    limite = time.perf_counter() + timeout
+    while 'ingesta' in at.session_state and at.session_state['ingesta'].estado == EN_CURSO:
+        if time.perf_counter() > limite:
+            raise TimeoutError("La ingesta del chat no terminó a tiempo")
+        time.sleep(intervalo)
+    return at.run()  # recoge el chat procesado
+
+
+def simular_sesion(numero, contenido, timeout, registros):
+    """Una sesión de usuario completa: privacidad, carga del chat y todas las opciones."""
+    _hilo.id_sesion = f"prueba-carga-{numero}"
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=timeout)
+
+    _medir(registros, numero, 'inicio', at.run)
+    aceptar = next(b for b in at.button if b.label.startswith("✅"))
+    _medir(registros, numero, 'privacidad', lambda: aceptar.click().run())
+
+    _archivos_por_sesion[_hilo.id_sesion] = ArchivoSintetico(f"chat_{numero}.txt", contenido)
+    _medir(registros, numero, 'carga', lambda: cargar_chat(at, timeout))
+
+    selector = next(s for s in at.selectbox if s.label.startswith("Elige el tipo"))
+    for opcion in selector.options[1:]:
+        selector = next(s for s in at.selectbox if s.label.startswith("Elige el tipo"))
+        _medir(registros, numero, opcion, lambda: selector.select(opcion).run())
+
+
+def vigilar_memoria(muestras, intervalo, parar):
+    """Muestrea la memoria del proceso y la cola del servidor de inferencia."""
+    proceso = psutil.Process()
+    inicio = time.perf_counter()
+    while not parar.wait(intervalo):
+        servidor = metodos.obtener_servidor_inferencia()
+        muestras.append({
+            't_s': time.perf_counter() - inicio,
+            'rss_mb': proceso.memory_info().rss / 2**20,
+            'registro_mb': obtener_registro_memoria().uso()['total'] / 2**20,
+            'mensajes_en_cola': sum(servidor.metricas()['mensajes_en_cola'].values()),
+        })
+
+
+def ejecutar_prueba(sesiones, mensajes, autores, costo_ms, escalonado, timeout, intervalo):
+    """Lanza las sesiones en hilos y devuelve (latencias por paso, muestras de memoria, contador del modelo)."""
+    contador = _Contador()
+    registros, muestras = [], []
+    chats = [generar_chat(mensajes, autores, semilla=i) for i in range(sesiones)]
+
+    def fabrica_modelo(task, lang="es", **kwargs):
+        return ModeloSimulado(task, costo_ms, contador)
+
+    Runtime._instance = _runtime_compartido()
+    parches = [
+        mock.patch.object(metodos, 'create_analyzer', fabrica_modelo),
+        mock.patch.object(almacen_modelos, 'DIR_ALMACEN', ''),  # nunca cargar los modelos reales del almacén
+        mock.patch.object(modulo_app_test, 'LocalScriptRunner', _ScriptRunnerPorSesion),
+        mock.patch.object(modulo_app_test, 'Runtime', _RuntimeIgnorado),
+        mock.patch.object(st, 'file_uploader', _file_uploader_simulado),
+        # La opción se activa una vez para toda la prueba, no en cada ejecución
+        mock.patch.object(modulo_app_test, 'patch_config_options', lambda opciones: nullcontext()),
+    ]
+    for parche in parches:
+        parche.start()
+
+    parar = threading.Event()
+    vigilante = threading.Thread(target=vigilar_memoria, args=(muestras, intervalo, parar), daemon=True)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            vigilante.start()
+            hilos = []
+            for i in range(sesiones):
+                hilo = threading.Thread(target=simular_sesion, args=(i, chats[i], timeout, registros))
+                hilo.start()
+                hilos.append(hilo)
+                time.sleep(escalonado)
+            for hilo in hilos:
+                hilo.join()
+    finally:
+        parar.set()
+        vigilante.join()
+        for parche in parches:
+            parche.stop()
+        Runtime._instance = None
+
+    return pd.DataFrame(registros), pd.DataFrame(muestras), contador
+
+
+def resumir_latencias(registros):
+    """Percentiles de latencia (s) por paso, en el orden en que se ejecutan."""
+    orden = list(dict.fromkeys(registros['paso']))
+    resumen = registros.groupby('paso')['segundos'].describe(percentiles=[0.5, 0.95])
+    resumen = resumen[['count', '50%', '95%', 'max']].rename(columns={'count': 'n', '50%': 'p50', '95%': 'p95'})
+    resumen['errores'] = registros.groupby('paso')['error'].count()
+    return resumen.reindex(orden)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones simultáneas (modelos simulados).")
+    parser.add_argument('--sesiones', type=int, default=4, help="Sesiones simultáneas")
+    parser.add_argument('--mensajes', type=int, default=2000, help="Mensajes por chat sintético")
+    parser.add_argument('--autores', type=int, default=5, help="Autores por chat sintético")
+    parser.add_argument('--costo-ms', type=float, default=0.5, help="Coste simulado del modelo por mensaje (ms)")
+    parser.add_argument('--escalonado', type=float, default=0.5, help="Segundos entre el inicio de cada sesión")
+    parser.add_argument('--timeout', type=float, default=600, help="Tiempo máximo por ejecución del script (s)")
+    parser.add_argument('--intervalo', type=float, default=0.5, help="Intervalo de muestreo de memoria (s)")
+    parser.add_argument('--salida', help="Carpeta donde guardar los CSV de latencias y memoria")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    registros, muestras, contador = ejecutar_prueba(
+        args.sesiones, args.mensajes, args.autores, args.costo_ms, args.escalonado, args.timeout, args.intervalo
+    )
+    duracion = time.perf_counter() - inicio
+
+    print(f"\n=== {args.sesiones} sesiones × {args.mensajes} mensajes en {duracion:.1f} s ===\n")
+    print("Latencia por paso (s):")
+    print(resumir_latencias(registros).round(3).to_string())
+
+    servidor = metodos.obtener_servidor_inferencia().metricas()
+    print(f"\nModelo: {contador.llamadas} llamadas, {contador.mensajes} mensajes, "
+          f"máximo {contador.max_activas} llamadas simultáneas")
+    print(f"Servidor de inferencia: lote medio {servidor['tam_lote_medio']:.1f}, "
+          f"latencia p50 {servidor['latencia_p50_ms']:.0f} ms, p95 {servidor['latencia_p95_ms']:.0f} ms")
+    modelos = servidor['modelos']
+    print(f"Residencia de modelos: {modelos['cargas']} cargas, {modelos['expulsiones']} expulsiones, "
+          f"{modelos['aciertos']} aciertos, {modelos['excesos']} cargas sobre el presupuesto")
+    if not muestras.empty:
+        print(f"Memoria del proceso: pico {muestras['rss_mb'].max():.0f} MB "
+              f"(registro de sesiones: pico {muestras['registro_mb'].max():.0f} MB)")
+
+    errores = registros.dropna(subset=['error'])
+    if not errores.empty:
+        print("\nErrores:")
+        for _, fila in errores.drop_duplicates(['paso', 'error']).iterrows():
+            print(f"  [{fila['paso']}] {fila['error']}")
+
+    if args.salida:
+        os.makedirs(args.salida, exist_ok=True)
+        registros.to_csv(os.path.join(args.salida, "latencias.csv"), index=False)
+        muestras.to_csv(os.path.join(args.salida, "memoria.csv"), index=False)
+        print(f"\nResultados guardados en {args.salida}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Tiempo de arranque de los modelos: create_analyzer frente al almacén local de
+pesos mapeados en memoria (Utils/almacen_modelos.py).
+
+Cada carga se mide en un proceso nuevo, como en un arranque real del servidor.
+Si el artefacto de una variante no existe, se crea antes de medir.
+
+Uso (desde la raíz del proyecto):
+    python Herramientas/tiempo_arranque.py
+    python Herramientas/tiempo_arranque.py --tareas emotion --variantes fp32 bf16 --repeticiones 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Se ejecuta en el proceso hijo: carga el modelo, hace una predicción e imprime los tiempos
+CODIGO_MEDICION = """
+import os, sys, time
+import psutil
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from Utils import almacen_modelos
+importacion = time.perf_counter() - inicio
+inicio = time.perf_counter()
+if {metodo!r} == 'create_analyzer':
+    analizador = almacen_modelos.create_analyzer(task={tarea!r}, lang='es')
+else:
+    analizador = almacen_modelos.cargar_artefacto({tarea!r}, 'es', {metodo!r})
+carga = time.perf_counter() - inicio
+inicio = time.perf_counter()
+analizador.predict('hola, ¿qué tal estás?')
+prediccion = time.perf_counter() - inicio
+rss = psutil.Process().memory_info().rss / 2**20
+print(importacion, carga, prediccion, rss)
+"""
+
+
+def medir(tarea, metodo):
+    """(importación, carga, primera predicción, RSS en MB) de una carga en un proceso nuevo."""
+    codigo = CODIGO_MEDICION.format(raiz=RAIZ, tarea=tarea, metodo=metodo)
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True, cwd=RAIZ)
+    return tuple(float(x) for x in salida.stdout.strip().splitlines()[-1].split())
+
+
+def preparar_artefacto(tarea, variante):
+    from Utils import almacen_modelos
+    if not almacen_modelos.existe_artefacto(tarea, 'es', variante):
+        print(f"Guardando {tarea}-es-{variante} en {almacen_modelos.DIR_ALMACEN} ...")
+        analizador = almacen_modelos.create_analyzer(task=tarea, lang='es')
+        almacen_modelos.guardar_artefacto(analizador, tarea, 'es', variante)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tareas", nargs="+", default=["emotion", "sentiment"])
+    parser.add_argument("--variantes", nargs="+", default=["fp32", "bf16"], choices=["fp32", "bf16"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    for tarea in args.tareas:
+        for variante in args.variantes:
+            preparar_artefacto(tarea, variante)
+
+    print(f"\n{'Tarea':<10} {'Método':<16} {'Importar (s)':>13} {'Cargar (s)':>11} {'1ª pred. (s)':>13} {'RSS (MB)':>9}")
+    for tarea in args.tareas:
+        for metodo in ["create_analyzer", *args.variantes]:
+            medidas = [medir(tarea, metodo) for _ in range(args.repeticiones)]
+            importacion, carga, prediccion, rss = (statistics.median(col) for col in zip(*medidas))
+            print(f"{tarea:<10} {metodo:<16} {importacion:>13.2f} {carga:>11.2f} {prediccion:>13.2f} {rss:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ import os
 # --- Importaciones de Modelos de IA ---
 # Importamos la función 'create_analyzer' que usaste
 from pysentimiento import create_analyzer
+from Utils.servidor_inferencia import ServidorInferencia
+from Utils.almacen_modelos import cargar_analizador
 
 # --- Configuración Inicial (Solo se ejecuta una vez) ---
 
@@ -31,21 +33,45 @@ def descargar_nltk_stopwords():
 
 descargar_nltk_stopwords()
 
-# --- Funciones de Carga y Cache de Modelos de IA ---
+# --- Funciones de Carga de Modelos de IA ---
+# Los modelos los carga y los posee el servidor de inferencia (uno por proceso),
+# por eso estas funciones ya no se cachean con st.cache_resource.
+# Se cargan desde el almacén local (pesos mapeados en memoria) si el modelo ya se
+# guardó allí; si no, con create_analyzer, y se guardan para el próximo arranque.
 
-@st.cache_resource
 def cargar_modelo_emociones():
     """
-    Carga y cachea el modelo de EMOCIONES.
-    _resource se usa para objetos complejos (como modelos) que no deben ser serializados.
+    Carga el modelo de EMOCIONES.
     """
-    return create_analyzer(task="emotion", lang="es")
+    return cargar_analizador("emotion", lang="es", crear=create_analyzer)
 
-@st.cache_resource
 def cargar_modelo_sentimientos():
     """
-    Carga y cachea el modelo de SENTIMIENTOS (Pos/Neg/Neu).
+    Carga el modelo de SENTIMIENTOS (Pos/Neg/Neu).
+    """
+    return cargar_analizador("sentiment", lang="es", crear=create_analyzer)
+
+@st.cache_resource
+def obtener_servidor_inferencia():
+    """
+    Devuelve el servidor de inferencia compartido por todas las sesiones.
+    _resource garantiza que solo exista uno en el proceso de Streamlit.
+    """
+    return ServidorInferencia({
+        'emotion': cargar_modelo_emociones,
+        'sentiment': cargar_modelo_sentimientos,
+    })
+
+def predecir_emociones(textos):
+    """
+    Predice emociones encolando los mensajes en el servidor de inferencia.
+    """
+    return obtener_servidor_inferencia().predecir('emotion', textos)
+
+def predecir_sentimientos(textos):
+    """
+    Predice sentimientos encolando los mensajes en el servidor de inferencia.
     """
-    return create_analyzer(task="sentiment", lang="es")
+    return obtener_servidor_inferencia().predecir('sentiment', textos)
 
 # --- Funciones de Procesamiento de Datos (Cacheadas) ---
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import time
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+from pysentimiento import create_analyzer
+from pysentimiento.analyzer import AnalyzerForSequenceClassification, models as MODELOS_PYSENTIMIENTO
+
+# --- Almacén Local de Modelos (pesos mapeados en memoria) ---
+# create_analyzer reconstruye cada modelo desde la caché de Hugging Face en cada
+# arranque. Aquí se guarda una vez el modelo listo para usar (configuración,
+# tokenizador y pesos en un solo archivo de torch) y después se carga con
+# torch.load(mmap=True): los pesos no se copian a memoria, se leen del archivo
+# bajo demanda, y varios procesos del mismo equipo comparten esas páginas.
+
+# Carpeta del almacén (vacío = desactivado, se usa siempre create_analyzer)
+DIR_ALMACEN = os.environ.get(
+    "WHATSENTICS_ALMACEN_MODELOS", os.path.join(os.path.expanduser("~"), ".cache", "whatsentics", "modelos")
+)
+# Variante de los pesos: 'fp32' (original) o 'bf16' (mitad de memoria y de disco)
+VARIANTE = os.environ.get("WHATSENTICS_VARIANTE_MODELO", "fp32")
+TIPOS_VARIANTE = {'fp32': torch.float32, 'bf16': torch.bfloat16}
+
+ARCHIVO_PESOS = "pesos.pt"
+ARCHIVO_META = "meta.json"  # se escribe el último: si existe, el artefacto está completo
+VERSION_ALMACEN = 1
+
+logger = logging.getLogger(__name__)
+
+
+def ruta_artefacto(tarea, lang="es", variante=VARIANTE):
+    return os.path.join(DIR_ALMACEN, f"{tarea}-{lang}-{variante}")
+
+
+def modelo_origen(tarea, lang="es"):
+    """Nombre del modelo de Hugging Face del que sale el analizador de `tarea` (None si no es de pysentimiento)."""
+    return MODELOS_PYSENTIMIENTO.get(lang, {}).get(tarea, {}).get('model_name')
+
+
+def existe_artefacto(tarea, lang="es", variante=VARIANTE):
+    """
+    Si el almacén tiene un artefacto completo y vigente de `tarea`: de esta versión
+    del almacén y del mismo modelo que usaría create_analyzer (si pysentimiento
+    cambia de modelo, el artefacto viejo se reconstruye).
+    """
+    if not DIR_ALMACEN:
+        return False
+    try:
+        with open(os.path.join(ruta_artefacto(tarea, lang, variante), ARCHIVO_META), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('version') == VERSION_ALMACEN and meta.get('modelo') == modelo_origen(tarea, lang)
+
+
+def guardar_artefacto(analizador, tarea, lang="es", variante=VARIANTE):
+    """
+    Guarda un analizador de pysentimiento en el almacén. Si la variante es de menor
+    precisión, el modelo del analizador se convierte en el sitio.
+    """
+    ruta = ruta_artefacto(tarea, lang, variante)
+    os.makedirs(ruta, exist_ok=True)
+    modelo = analizador.model.to(TIPOS_VARIANTE[variante]).eval()
+
+    analizador.tokenizer.save_pretrained(ruta)
+    modelo.config.save_pretrained(ruta)
+
+    # Los buffers no persistentes (p. ej. position_ids) no van en state_dict y hay que guardarlos aparte
+    estado = modelo.state_dict()
+    buffers = {nombre: b for nombre, b in modelo.named_buffers() if nombre not in estado}
+    temporal = os.path.join(ruta, f"{ARCHIVO_PESOS}.{os.getpid()}.tmp")
+    torch.save({'estado': estado, 'buffers': buffers}, temporal)
+    os.replace(temporal, os.path.join(ruta, ARCHIVO_PESOS))
+
+    meta = {
+        'version': VERSION_ALMACEN,
+        'tarea': tarea,
+        'lang': lang,
+        'variante': variante,
+        'modelo': modelo_origen(tarea, lang),
+        'preprocessing_args': analizador.preprocessing_args,
+        'torch': torch.__version__,
+    }
+    temporal = os.path.join(ruta, f"{ARCHIVO_META}.{os.getpid()}.tmp")
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, os.path.join(ruta, ARCHIVO_META))
+
+
+def cargar_artefacto(tarea, lang="es", variante=VARIANTE):
+    """
+    Carga un analizador desde el almacén sin copiar los pesos: el modelo se crea
+    vacío (dispositivo 'meta') y sus parámetros pasan a apuntar al archivo mapeado.
+    """
+    ruta = ruta_artefacto(tarea, lang, variante)
+    with open(os.path.join(ruta, ARCHIVO_META), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    config = AutoConfig.from_pretrained(ruta)
+    with torch.device('meta'):
+        modelo = AutoModelForSequenceClassification.from_config(config, torch_dtype=TIPOS_VARIANTE[variante])
+
+    pesos = torch.load(os.path.join(ruta, ARCHIVO_PESOS), mmap=True, weights_only=True, map_location='cpu')
+    modelo.load_state_dict(pesos['estado'], assign=True)
+    for nombre, buffer in pesos['buffers'].items():
+        modulo, _, atributo = nombre.rpartition('.')
+        modelo.get_submodule(modulo)._buffers[atributo] = buffer
+    modelo.eval()
+
+    tokenizador = AutoTokenizer.from_pretrained(ruta)
+    return AnalyzerForSequenceClassification(modelo, tokenizador, tarea, meta['preprocessing_args'])
+
+
+def cargar_analizador(tarea, lang="es", crear=create_analyzer, variante=VARIANTE):
+    """
+    Devuelve el analizador de `tarea`: desde el almacén si el artefacto existe y es del
+    modelo actual; si no, con `crear` (create_analyzer), y lo guarda en el almacén
+    (sustituyendo el artefacto viejo) para el próximo arranque.
+    Cualquier fallo del almacén deja el camino original de create_analyzer.
+    """
+    if existe_artefacto(tarea, lang, variante):
+        try:
+            inicio = time.perf_counter()
+            analizador = cargar_artefacto(tarea, lang, variante)
+            logger.info("%s-%s-%s cargado del almacén en %.2f s", tarea, lang, variante, time.perf_counter() - inicio)
+            return analizador
+        except Exception as e:
+            logger.warning("No se pudo cargar %s-%s-%s del almacén, se usa create_analyzer: %s", tarea, lang, variante, e)
+
+    analizador = crear(task=tarea, lang=lang)
+    if DIR_ALMACEN and tarea in MODELOS_PYSENTIMIENTO.get(lang, {}):
+        try:
+            guardar_artefacto(analizador, tarea, lang, variante)
+        except Exception as e:
+            logger.warning("No se pudo guardar %s-%s-%s en el almacén: %s", tarea, lang, variante, e)
+    return analizador
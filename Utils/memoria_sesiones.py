@@ -0,0 +1,231 @@
+import atexit
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --- Configuración de Memoria ---
+
+# Memoria total (en MB) que pueden ocupar los datos de todas las sesiones del servidor.
+# No incluye lo que guarda st.cache_data: las opciones cacheadas no devuelven datos,
+# solo los elementos ya dibujados (gráficos y tablas), y esa caché la gestiona
+# Streamlit para todo el proceso, así que no se puede volcar ni cifrar por sesión.
+# Los datos de los que salen (chat, probabilidades, precálculos) sí se cuentan aquí.
+PRESUPUESTO_MB = float(os.environ.get("WHATSENTICS_MEMORIA_MB", "2048"))
+# Segundos sin actividad tras los cuales una sesión se considera inactiva y se puede volcar a disco.
+INACTIVIDAD_S = float(os.environ.get("WHATSENTICS_INACTIVIDAD_S", "300"))
+
+
+def _estimar_tamano(valor):
+    """
+    Estima los bytes que ocupa un valor guardado en la sesión. Las clases de
+    resultados propias exponen `nbytes`; sin él solo se cuenta el objeto en sí
+    (sys.getsizeof no sigue sus atributos).
+    """
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray) or hasattr(valor, 'nbytes'):
+        # Arrays y resultados derivados que saben su tamaño (AgregadoTemporal, ConteoExacto, EspacioAhorro...)
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_estimar_tamano(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_estimar_tamano(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class _EntradaSesion:
+    """Datos de una sesión: en memoria, o volcados (comprimidos y cifrados) en disco."""
+
+    def __init__(self):
+        self.datos = {}
+        self.tamanos = {}
+        self.ultimo_acceso = time.monotonic()
+        self.ruta_volcado = None
+        self.clave = None  # La clave de cifrado solo vive en memoria
+
+    @property
+    def bytes_en_memoria(self):
+        return 0 if self.ruta_volcado else sum(self.tamanos.values())
+
+
+class RegistroMemoria:
+    """
+    Contabiliza la memoria que usa cada sesión (el chat y sus resultados derivados)
+    y, si se supera el presupuesto del servidor, vuelca a disco los datos de las
+    sesiones inactivas. Los volcados se recargan al volver a pedirlos y se borran
+    en cuanto la sesión termina.
+    """
+
+    def __init__(self, presupuesto_mb=PRESUPUESTO_MB, inactividad_s=INACTIVIDAD_S):
+        self._presupuesto = int(presupuesto_mb * 1024 * 1024)
+        self._inactividad = inactividad_s
+        self._lock = threading.RLock()
+        self._sesiones = {}
+        self._directorio = tempfile.mkdtemp(prefix="whatsentics_")
+        atexit.register(shutil.rmtree, self._directorio, True)
+
+    # --- API ---
+
+    def guardar(self, id_sesion, clave, valor):
+        with self._lock:
+            entrada = self._entrada(id_sesion)
+            entrada.datos[clave] = valor
+            entrada.tamanos[clave] = _estimar_tamano(valor)
+            self._aplicar_presupuesto(id_sesion)
+
+    def obtener(self, id_sesion, clave, defecto=None):
+        with self._lock:
+            entrada = self._sesiones.get(id_sesion)
+            if entrada is None:
+                return defecto
+            entrada.ultimo_acceso = time.monotonic()
+            if entrada.ruta_volcado:
+                self._recargar(entrada)
+                self._aplicar_presupuesto(id_sesion)
+            return entrada.datos.get(clave, defecto)
+
+    def eliminar(self, id_sesion, clave=None):
+        """Elimina una clave de la sesión, o todos sus datos si no se indica clave."""
+        with self._lock:
+            entrada = self._sesiones.get(id_sesion)
+            if entrada is None:
+                return
+            if clave is None:
+                self._descartar(id_sesion)
+                return
+            if entrada.ruta_volcado:
+                self._recargar(entrada)
+            entrada.datos.pop(clave, None)
+            entrada.tamanos.pop(clave, None)
+
+    def uso(self, id_sesion=None):
+        """Devuelve el uso de memoria del servidor (y de la sesión indicada) en bytes."""
+        with self._lock:
+            self._purgar_sesiones_cerradas()
+            entrada = self._sesiones.get(id_sesion)
+            return {
+                'total': sum(e.bytes_en_memoria for e in self._sesiones.values()),
+                'presupuesto': self._presupuesto,
+                'sesiones': len(self._sesiones),
+                'sesiones_volcadas': sum(1 for e in self._sesiones.values() if e.ruta_volcado),
+                'sesion': sum(entrada.tamanos.values()) if entrada else 0,
+                'sesion_volcada': bool(entrada and entrada.ruta_volcado),
+            }
+
+    # --- Internos (llamar con self._lock adquirido) ---
+
+    def _entrada(self, id_sesion):
+        entrada = self._sesiones.get(id_sesion)
+        if entrada is None:
+            entrada = self._sesiones[id_sesion] = _EntradaSesion()
+        elif entrada.ruta_volcado:
+            self._recargar(entrada)
+        entrada.ultimo_acceso = time.monotonic()
+        return entrada
+
+    def _aplicar_presupuesto(self, id_actual):
+        self._purgar_sesiones_cerradas()
+        total = sum(e.bytes_en_memoria for e in self._sesiones.values())
+        if total <= self._presupuesto:
+            return
+
+        # Volcar primero las sesiones que llevan más tiempo sin actividad
+        ahora = time.monotonic()
+        candidatas = sorted(
+            (e for id_s, e in self._sesiones.items()
+             if id_s != id_actual and not e.ruta_volcado and e.datos
+             and ahora - e.ultimo_acceso >= self._inactividad),
+            key=lambda e: e.ultimo_acceso,
+        )
+        for entrada in candidatas:
+            if total <= self._presupuesto:
+                break
+            total -= entrada.bytes_en_memoria
+            self._volcar(entrada)
+
+    def _volcar(self, entrada):
+        entrada.clave = AESGCM.generate_key(bit_length=256)
+        nonce = os.urandom(12)
+        comprimido = zlib.compress(pickle.dumps(entrada.datos, protocol=pickle.HIGHEST_PROTOCOL), level=1)
+        cifrado = AESGCM(entrada.clave).encrypt(nonce, comprimido, None)
+
+        descriptor, ruta = tempfile.mkstemp(dir=self._directorio, suffix=".bin")
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(nonce)
+            f.write(cifrado)
+
+        entrada.ruta_volcado = ruta
+        entrada.datos = {}
+
+    def _recargar(self, entrada):
+        with open(entrada.ruta_volcado, 'rb') as f:
+            nonce = f.read(12)
+            cifrado = f.read()
+        comprimido = AESGCM(entrada.clave).decrypt(nonce, cifrado, None)
+        entrada.datos = pickle.loads(zlib.decompress(comprimido))
+        self._borrar_volcado(entrada)
+
+    def _borrar_volcado(self, entrada):
+        if entrada.ruta_volcado:
+            try:
+                os.remove(entrada.ruta_volcado)
+            except OSError:
+                pass
+        entrada.ruta_volcado = None
+        entrada.clave = None
+
+    def _descartar(self, id_sesion):
+        entrada = self._sesiones.pop(id_sesion, None)
+        if entrada is not None:
+            self._borrar_volcado(entrada)
+            entrada.datos = {}
+
+    def _purgar_sesiones_cerradas(self):
+        """Descarta (y borra de disco) los datos de las sesiones que ya se cerraron."""
+        if not runtime.exists():
+            return
+        instancia = runtime.get_instance()
+        for id_sesion in list(self._sesiones):
+            if not instancia.is_active_session(id_sesion):
+                self._descartar(id_sesion)
+
+
+@st.cache_resource
+def obtener_registro_memoria():
+    """Devuelve el registro de memoria compartido por todas las sesiones del servidor."""
+    return RegistroMemoria()
+
+
+def id_sesion_actual():
+    """Identificador de la sesión de Streamlit que está ejecutando el script."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def guardar_dato_sesion(clave, valor, id_sesion=None):
+    """Guarda un dato de la sesión actual (o de `id_sesion`) contabilizando su memoria."""
+    obtener_registro_memoria().guardar(id_sesion or id_sesion_actual(), clave, valor)
+
+
+def obtener_dato_sesion(clave, defecto=None, id_sesion=None):
+    """Devuelve un dato de la sesión, recargándolo de disco si se había volcado."""
+    return obtener_registro_memoria().obtener(id_sesion or id_sesion_actual(), clave, defecto)
+
+
+def eliminar_datos_sesion(clave=None, id_sesion=None):
+    """Elimina un dato (o todos) de la sesión, incluidos sus volcados en disco."""
+    obtener_registro_memoria().eliminar(id_sesion or id_sesion_actual(), clave)
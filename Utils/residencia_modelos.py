@@ -0,0 +1,128 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- Residencia de Modelos en Memoria ---
+# Cada modelo (emociones, sentimientos) ocupa cientos de MB. En réplicas con poca
+# memoria no caben los dos junto a los datos de las sesiones, así que se cargan
+# bajo demanda dentro de un presupuesto: si cargar uno lo superaría, se descarga
+# el que lleva más tiempo sin usarse. Un modelo en uso está fijado y no se descarga.
+
+# Memoria (en MB) que pueden ocupar los modelos cargados (0 = sin límite)
+PRESUPUESTO_MODELOS_MB = float(os.environ.get("WHATSENTICS_PRESUPUESTO_MODELOS_MB", "0"))
+
+
+def tamano_analizador(analizador):
+    """Bytes de los pesos y buffers del modelo de un analizador (0 si no tiene modelo de torch)."""
+    modelo = getattr(analizador, 'model', None)
+    if modelo is None or not hasattr(modelo, 'parameters'):
+        return 0
+    tensores = list(modelo.parameters()) + list(modelo.buffers())
+    return sum(t.numel() * t.element_size() for t in tensores)
+
+
+class _ModeloResidente:
+    def __init__(self, analizador, tamano):
+        self.analizador = analizador
+        self.tamano = tamano
+        self.fijaciones = 0
+
+
+class GestorResidencia:
+    """
+    Carga los modelos bajo demanda y los descarga (el menos usado recientemente
+    primero) para no superar `presupuesto_mb`. Si los modelos fijados ya ocupan
+    todo el presupuesto, el nuevo se carga igualmente y se cuenta como exceso.
+    """
+
+    def __init__(self, cargadores, presupuesto_mb=PRESUPUESTO_MODELOS_MB):
+        # cargadores: {'emotion': funcion_que_devuelve_el_analizador, 'sentiment': ...}
+        self._cargadores = cargadores
+        self._presupuesto = presupuesto_mb * 2**20 if presupuesto_mb > 0 else None
+        self._residentes = OrderedDict()  # tarea -> _ModeloResidente, del menos al más reciente
+        self._tamanos_conocidos = {}  # tarea -> bytes de su última carga
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._contadores = {'cargas': 0, 'expulsiones': 0, 'aciertos': 0, 'excesos': 0}
+
+    @contextmanager
+    def usar(self, tarea):
+        """Devuelve el analizador de `tarea`, cargándolo si hace falta, fijado mientras dure el bloque."""
+        residente = self._fijar(tarea)
+        try:
+            yield residente.analizador
+        finally:
+            with self._lock:
+                residente.fijaciones -= 1
+
+    def metricas(self):
+        with self._lock:
+            return {
+                **self._contadores,
+                'residentes': {tarea: r.tamano for tarea, r in self._residentes.items()},
+                'bytes_residentes': sum(r.tamano for r in self._residentes.values()),
+                'presupuesto': self._presupuesto,
+            }
+
+    # --- Internos ---
+
+    def _fijar(self, tarea):
+        residente = self._fijar_si_residente(tarea)
+        if residente is not None:
+            return residente
+
+        # Las cargas van de una en una (dos a la vez podrían superar el presupuesto),
+        # pero sin bloquear el lock de estado: los aciertos y las métricas no esperan.
+        with self._lock_carga:
+            residente = self._fijar_si_residente(tarea)
+            if residente is not None:
+                return residente
+
+            # Hacer sitio antes de cargar (con el tamaño de la carga anterior, si la hubo)
+            with self._lock:
+                self._liberar(self._tamanos_conocidos.get(tarea, 0))
+            analizador = self._cargadores[tarea]()
+            residente = _ModeloResidente(analizador, tamano_analizador(analizador))
+            residente.fijaciones += 1
+
+            with self._lock:
+                self._tamanos_conocidos[tarea] = residente.tamano
+                self._residentes[tarea] = residente
+                self._contadores['cargas'] += 1
+                # Con el tamaño real ya conocido, ajustarse al presupuesto
+                if not self._liberar(0):
+                    self._contadores['excesos'] += 1
+            return residente
+
+    def _fijar_si_residente(self, tarea):
+        with self._lock:
+            residente = self._residentes.get(tarea)
+            if residente is not None:
+                self._contadores['aciertos'] += 1
+                self._residentes.move_to_end(tarea)
+                residente.fijaciones += 1
+            return residente
+
+    def _liberar(self, necesarios):
+        """
+        Descarga modelos no fijados, del menos reciente al más reciente, hasta que
+        quepan `necesarios` bytes más. Devuelve si caben. Llamar con self._lock adquirido.
+        """
+        if self._presupuesto is None:
+            return True
+        ocupados = sum(r.tamano for r in self._residentes.values())
+        expulsados = False
+        for tarea in list(self._residentes):
+            if ocupados + necesarios <= self._presupuesto:
+                break
+            residente = self._residentes[tarea]
+            if residente.fijaciones == 0:
+                del self._residentes[tarea]
+                ocupados -= residente.tamano
+                self._contadores['expulsiones'] += 1
+                expulsados = True
+        if expulsados:
+            gc.collect()  # los pesos se liberan en cuanto no queda ninguna referencia
+        return ocupados + necesarios <= self._presupuesto
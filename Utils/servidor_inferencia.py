@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from collections import deque
+
+import torch
+
+from Utils.residencia_modelos import GestorResidencia
+from Utils.ventanas_texto import dividir_en_ventanas, combinar_ventanas
+
+# --- Configuración del Servidor de Inferencia ---
+# Todos los valores se pueden ajustar con variables de entorno en el despliegue.
+
+# Máximo de mensajes que se envían juntos al modelo en una sola llamada.
+TAM_LOTE = int(os.environ.get("WHATSENTICS_TAM_LOTE", "64"))
+# Tiempo máximo que un mensaje espera a que se llene su micro-lote.
+ESPERA_MAX_MS = float(os.environ.get("WHATSENTICS_ESPERA_MAX_MS", "25"))
+# Hilos de CPU que usa torch. Como un único hilo atiende todas las sesiones,
+# este número es el total de núcleos que consume la inferencia del servidor.
+HILOS_TORCH = int(os.environ.get("WHATSENTICS_HILOS_TORCH", str(max(1, (os.cpu_count() or 2) - 1))))
+
+
+class _Solicitud:
+    """
+    Una llamada a `predecir` de una sesión. Se divide en fragmentos de como mucho
+    TAM_LOTE mensajes para que las solicitudes grandes no bloqueen a las pequeñas.
+    """
+
+    def __init__(self, tarea, textos):
+        self.tarea = tarea
+        self.textos = textos
+        self.resultados = [None] * len(textos)
+        self.pendientes = 0
+        self.error = None
+        self.creada = time.perf_counter()
+        self.terminada = threading.Event()
+
+
+class ServidorInferencia:
+    """
+    Servicio de inferencia compartido por todas las sesiones del proceso de Streamlit.
+
+    Las sesiones encolan sus mensajes y un único hilo trabajador los agrupa en
+    micro-lotes por modelo. Así la CPU la reparte un solo planificador en lugar
+    de competir varias llamadas a `.predict` a la vez. Los mensajes largos de cada
+    micro-lote se evalúan por ventanas de tokens en una llamada aparte (ver
+    Utils/ventanas_texto.py), para que no alarguen el relleno de los cortos.
+    """
+
+    def __init__(self, cargadores, tam_lote=TAM_LOTE, espera_max_ms=ESPERA_MAX_MS, hilos_torch=HILOS_TORCH):
+        # cargadores: {'emotion': funcion_que_devuelve_el_analizador, 'sentiment': ...}
+        # Los modelos se cargan y descargan dentro del presupuesto de memoria (ver residencia_modelos.py)
+        self._modelos = GestorResidencia(cargadores)
+        self._tam_lote = max(1, tam_lote)
+        self._espera_max = espera_max_ms / 1000.0
+        self._hilos_torch = hilos_torch
+
+        self._colas = {tarea: deque() for tarea in cargadores}
+        self._cond = threading.Condition()
+
+        # Métricas
+        self._latencias = deque(maxlen=2000)
+        self._tam_lotes = deque(maxlen=2000)
+        self._solicitudes_atendidas = 0
+        self._mensajes_atendidos = 0
+        # Cómputo de los mensajes cortos frente a los largos (divididos en ventanas)
+        self._computo = {
+            'cortos': {'mensajes': 0, 'segundos': 0.0},
+            'largos': {'mensajes': 0, 'ventanas': 0, 'segundos': 0.0},
+        }
+
+        self._hilo = threading.Thread(target=self._bucle, name="servidor-inferencia", daemon=True)
+        self._hilo.start()
+
+    # --- API para las sesiones ---
+
+    def predecir(self, tarea, textos):
+        """
+        Envía `textos` al modelo `tarea` y espera sus resultados.
+        Devuelve la misma lista de objetos que devolvería `analizador.predict`.
+        """
+        if tarea not in self._colas:
+            raise ValueError(f"Tarea de inferencia desconocida: {tarea}")
+
+        textos = list(textos)
+        if not textos:
+            return []
+
+        solicitud = _Solicitud(tarea, textos)
+        with self._cond:
+            for inicio in range(0, len(textos), self._tam_lote):
+                fin = min(inicio + self._tam_lote, len(textos))
+                self._colas[tarea].append((solicitud, inicio, fin, time.perf_counter()))
+                solicitud.pendientes += 1
+            self._cond.notify_all()
+
+        solicitud.terminada.wait()
+        if solicitud.error is not None:
+            raise solicitud.error
+        return solicitud.resultados
+
+    def metricas(self):
+        """Devuelve profundidad de cola y latencias (en ms) de las últimas solicitudes."""
+        with self._cond:
+            profundidad = {tarea: sum(f - i for _, i, f, _ in cola) for tarea, cola in self._colas.items()}
+            latencias = sorted(self._latencias)
+            tam_lotes = list(self._tam_lotes)
+            atendidas = self._solicitudes_atendidas
+            mensajes = self._mensajes_atendidos
+            cortos, largos = dict(self._computo['cortos']), dict(self._computo['largos'])
+
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1000
+
+        return {
+            'mensajes_en_cola': profundidad,
+            'solicitudes_atendidas': atendidas,
+            'mensajes_atendidos': mensajes,
+            'latencia_p50_ms': percentil(50),
+            'latencia_p95_ms': percentil(95),
+            'latencia_max_ms': latencias[-1] * 1000 if latencias else 0.0,
+            'tam_lote_medio': sum(tam_lotes) / len(tam_lotes) if tam_lotes else 0.0,
+            'hilos_torch': self._hilos_torch,
+            'mensajes_largos': largos['mensajes'],
+            'ventanas_largos': largos['ventanas'],
+            'segundos_cortos': cortos['segundos'],
+            'segundos_largos': largos['segundos'],
+            'porcentaje_computo_largos': 100 * largos['segundos'] / max(cortos['segundos'] + largos['segundos'], 1e-9),
+            'modelos': self._modelos.metricas(),
+        }
+
+    # --- Hilo trabajador ---
+
+    def _siguiente_lote(self):
+        """
+        Espera a que haya trabajo y arma un micro-lote de una sola tarea.
+        Debe llamarse con self._cond adquirido.
+        """
+        while not any(self._colas.values()):
+            self._cond.wait()
+
+        # Atender primero la tarea cuyo fragmento lleva más tiempo esperando
+        tarea = min((t for t, c in self._colas.items() if c), key=lambda t: self._colas[t][0][3])
+        cola = self._colas[tarea]
+
+        # Esperar a que se llene el lote o venza el límite de latencia del más antiguo
+        limite = cola[0][3] + self._espera_max
+        while sum(f - i for _, i, f, _ in cola) < self._tam_lote:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            self._cond.wait(timeout=restante)
+
+        fragmentos, total = [], 0
+        while cola and total + (cola[0][2] - cola[0][1]) <= self._tam_lote:
+            fragmento = cola.popleft()
+            fragmentos.append(fragmento)
+            total += fragmento[2] - fragmento[1]
+        return tarea, fragmentos
+
+    def _predecir_por_ventanas(self, analizador, textos):
+        """
+        Evalúa un micro-lote: los mensajes cortos en una llamada y las ventanas de
+        todos los largos en otra, y combina las ventanas de cada mensaje largo.
+        """
+        inicio = time.perf_counter()
+        ventanas = [dividir_en_ventanas(t, getattr(analizador, 'tokenizer', None)) for t in textos]
+        largos = [i for i, v in enumerate(ventanas) if len(v) > 1]
+        cortos = [i for i, v in enumerate(ventanas) if len(v) == 1]
+        tiempo_division = time.perf_counter() - inicio
+
+        resultados = [None] * len(textos)
+        inicio = time.perf_counter()
+        if cortos:
+            with torch.inference_mode():
+                salida = analizador.predict([textos[i] for i in cortos])
+            for i, resultado in zip(cortos, salida):
+                resultados[i] = resultado
+        tiempo_cortos = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        todas = [v for i in largos for v in ventanas[i]]
+        if largos:
+            with torch.inference_mode():
+                salida = analizador.predict(todas)
+            desplazamiento = 0
+            for i in largos:
+                n = len(ventanas[i])
+                resultados[i] = combinar_ventanas(textos[i], salida[desplazamiento:desplazamiento + n])
+                desplazamiento += n
+        tiempo_largos = time.perf_counter() - inicio + tiempo_division
+
+        with self._cond:
+            self._computo['cortos']['mensajes'] += len(cortos)
+            self._computo['cortos']['segundos'] += tiempo_cortos
+            self._computo['largos']['mensajes'] += len(largos)
+            self._computo['largos']['ventanas'] += len(todas)
+            self._computo['largos']['segundos'] += tiempo_largos
+        return resultados
+
+    def _bucle(self):
+        torch.set_num_threads(self._hilos_torch)
+
+        while True:
+            with self._cond:
+                tarea, fragmentos = self._siguiente_lote()
+
+            textos = [t for solicitud, i, f, _ in fragmentos for t in solicitud.textos[i:f]]
+            try:
+                with self._modelos.usar(tarea) as analizador:
+                    resultados = self._predecir_por_ventanas(analizador, textos)
+                error = None
+            except Exception as e:
+                resultados, error = None, e
+
+            ahora = time.perf_counter()
+            with self._cond:
+                self._tam_lotes.append(len(textos))
+                desplazamiento = 0
+                for solicitud, inicio, fin, _ in fragmentos:
+                    if error is not None:
+                        solicitud.error = error
+                    else:
+                        solicitud.resultados[inicio:fin] = resultados[desplazamiento:desplazamiento + fin - inicio]
+                    desplazamiento += fin - inicio
+                    solicitud.pendientes -= 1
+                    if solicitud.pendientes == 0:
+                        self._latencias.append(ahora - solicitud.creada)
+                        self._solicitudes_atendidas += 1
+                        self._mensajes_atendidos += len(solicitud.textos)
+                        solicitud.terminada.set()
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+from pysentimiento.analyzer import AnalyzerOutput
+
+# --- Ventanas de Tokens para Mensajes Largos ---
+# leer_chat une las líneas de continuación, así que un texto pegado o una cadena
+# reenviada llega como un solo mensaje de miles de caracteres. El modelo solo lee
+# los primeros 128 tokens y, además, ese mensaje alarga el relleno de todo su lote.
+# Los mensajes largos se dividen en ventanas de tokens que se evalúan juntas, en
+# lotes aparte, y sus probabilidades se combinan en una sola etiqueta por mensaje.
+
+# Solo se tokenizan los mensajes de al menos estos caracteres (el resto cabe seguro)
+UMBRAL_CARACTERES_LARGO = int(os.environ.get("WHATSENTICS_UMBRAL_CARACTERES_LARGO", "300"))
+# Tokens por ventana. Menos que los 128 del modelo: pysentimiento preprocesa el
+# texto (p. ej. emojis a palabras) después de dividirlo y puede alargarlo.
+TOKENS_VENTANA = int(os.environ.get("WHATSENTICS_TOKENS_VENTANA", "96"))
+# Tokens que comparten dos ventanas seguidas, para no cortar frases sin contexto
+SOLAPE_VENTANA = int(os.environ.get("WHATSENTICS_SOLAPE_VENTANA", "16"))
+# Máximo de ventanas por mensaje; si hay más, se toman repartidas por todo el texto
+MAX_VENTANAS_MENSAJE = int(os.environ.get("WHATSENTICS_MAX_VENTANAS_MENSAJE", "16"))
+# Cómo se combinan las ventanas: 'media' (probabilidades medias) o 'max_confianza'
+# (la ventana cuya clase más probable tiene mayor probabilidad)
+COMBINACION_VENTANAS = os.environ.get("WHATSENTICS_COMBINACION_VENTANAS", "media")
+
+
+def dividir_en_ventanas(texto, tokenizador, tokens_ventana=TOKENS_VENTANA, solape=SOLAPE_VENTANA,
+                        max_ventanas=MAX_VENTANAS_MENSAJE):
+    """
+    Divide `texto` en fragmentos de como mucho `tokens_ventana` tokens. Devuelve
+    [texto] si ya cabe en una ventana (o si el tokenizador no da posiciones).
+    """
+    if len(texto) < UMBRAL_CARACTERES_LARGO or tokenizador is None or not getattr(tokenizador, 'is_fast', False):
+        return [texto]
+
+    posiciones = tokenizador(texto, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+    if len(posiciones) <= tokens_ventana:
+        return [texto]
+
+    paso = max(1, tokens_ventana - solape)
+    inicios = list(range(0, len(posiciones) - solape, paso))
+    if len(inicios) > max_ventanas:
+        inicios = [inicios[i] for i in np.linspace(0, len(inicios) - 1, max_ventanas).round().astype(int)]
+
+    ventanas = []
+    for inicio in inicios:
+        fin = min(inicio + tokens_ventana, len(posiciones)) - 1
+        ventanas.append(texto[posiciones[inicio][0]:posiciones[fin][1]])
+    return ventanas
+
+
+def combinar_ventanas(texto, resultados, modo=COMBINACION_VENTANAS):
+    """Combina los resultados de las ventanas de un mensaje en un único AnalyzerOutput."""
+    if len(resultados) == 1:
+        return resultados[0]
+
+    if modo == 'max_confianza':
+        mejor = max(resultados, key=lambda r: max(r.probas.values()))
+        probas = dict(mejor.probas)
+    elif modo == 'media':
+        clases = resultados[0].probas.keys()
+        probas = {c: float(np.mean([r.probas.get(c, 0.0) for r in resultados])) for c in clases}
+    else:
+        raise ValueError(f"Combinación de ventanas desconocida: {modo}")
+    return AnalyzerOutput(texto, None, probas, is_multilabel=getattr(resultados[0], 'is_multilabel', False))